@@ -6,17 +6,30 @@ Command-line script for cleaning European Patent (EP) XML documents
 for use in NLP tasks, such as pretraining language models.
 
 Usage:
-    python clean_patents.py --input_folder <XML_ROOT_FOLDER> --output_file <OUTPUT_JSONL> [--workers N]
+    python clean_patents.py --input_folder <XML_ROOT_FOLDER> --output_file <OUTPUT_JSONL> [--workers N] [--chunksize N] [--rebuild]
+        [--format jsonl|parquet] [--row_group_size N]
 
 Arguments:
     --input_folder : str
         Top-level folder containing EP XML patent files. The script will recursively
-        scan all subfolders for XML files.
+        scan all subfolders for XML files, and also reads documents stored in
+        compressed shards (`scraper_epo_pub_server.py scrape xml --storage shards`).
     --output_file  : str
         Path to save the cleaned output as a JSONL file. Each line is a JSON object
-        with keys "filename", "description", and "claim1".
+        with keys "pn", "filename", "date", "description", and "claim1", in input order
+        (sorted file paths, then shards in date and document order).
     --workers      : int, optional (default=1)
         Number of parallel processes to use. Increase for faster processing on multi-core machines.
+    --chunksize    : int, optional (default=256)
+        Number of files handed to a worker process per task.
+    --rebuild      : flag, optional
+        Ignore and discard the incremental state, cleaning every file again.
+    --format       : str, optional (default=jsonl)
+        "parquet" writes --output_file as a Parquet table instead (same records in the
+        same order, plus length and hash columns; see cleaned_table.py). Needs pyarrow
+        (the "parquet" extra).
+    --row_group_size : int, optional (default=10000)
+        Records per Parquet row group.
 
 Processing / Cleaning Steps:
 1. Only English descriptions are processed:
@@ -45,10 +58,30 @@ Processing / Cleaning Steps:
 6. Optional first and last paragraph removal can be added downstream to reduce boilerplate.
 7. Output:
     - Saved as JSONL, one patent per line, suitable for downstream NLP processing.
+    - Each record carries its publication number ("pn") and source path relative to
+      --input_folder ("filename"). Record order is the same on every run and for any
+      --workers, so outputs can be diffed and joined downstream.
 
 Notes:
 - The script uses lxml with comment removal.
-- Parallel processing is supported via ProcessPoolExecutor.
+- Parallel processing uses a multiprocessing Pool. Files are dispatched in chunks of
+  --chunksize paths, and each worker writes its records straight to its own part file.
+  The parent only receives small manifest entries per chunk.
+- Runs are incremental and resumable. State is kept next to the output:
+      <OUTPUT_JSONL>.state/config          fingerprint of SPECIAL_TOKENS, UNITS, the regexes
+                                           and the cleaning functions
+      <OUTPUT_JSONL>.state/manifest.jsonl  per source: size + mtime (length + offset for
+                                           shard members), content hash, record location
+      <OUTPUT_JSONL>.state/parts/          the cleaned records
+  A file whose stamp is unchanged is skipped; one whose stamp changed but whose content
+  hash did not is skipped as well. Manifest entries are appended and fsynced after each
+  chunk, so an interrupted run resumes from its last finished chunk. The output file is
+  then rebuilt atomically, in input order, from the records the manifest points at.
+  A changed configuration discards the state. Workers only create a part file once
+  they write a record, so a run with nothing to clean adds none; records of changed
+  files are superseded, and a part is deleted once none of its records is referenced.
+  Entries of files that left the input are dropped, and the manifest is rewritten
+  with one line per remaining file after each run that changed it.
 - Memory usage is modest since each XML file is processed independently.
 """
 
@@ -56,10 +89,17 @@ Notes:
 import os
 import json
 import re
+import time
+import shutil
+import hashlib
+import inspect
 import argparse
+import uuid
+from multiprocessing import Pool
 from lxml import etree
 from tqdm.auto import tqdm
-from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from xml_store import ShardRef, iter_shard_refs, read_source, source_name
 
 # ---------- Special tokens and number units ----------
 SPECIAL_TOKENS = {
@@ -90,42 +130,98 @@ NUM_REGEX = re.compile(
     rf"(?<![A-Za-z])\b\d+(\.\d+)?\s*(?:{UNIT_PATTERN})?\b(?![A-Za-z])",
     flags=re.IGNORECASE,
 )
+# Same matches as NUM_REGEX (every match starts with a digit), but the leading
+# lookahead lets the scan skip non-digit positions about twice as fast
+NUM_SCAN_REGEX = re.compile(r"(?=\d)" + NUM_REGEX.pattern, NUM_REGEX.flags)
 xml_parser = etree.XMLParser(remove_comments=True, recover=True)
 
 # ---------- Text processing functions ----------
 def normalize_numbers(text: str) -> str:
     if not text:
         return ""
-    return NUM_REGEX.sub("<NUM>", text)
+    return NUM_SCAN_REGEX.sub("<NUM>", text)
+
+_CRLF_REGEX = re.compile(r"\r\n?")
+_SPACE_BEFORE_NEWLINE_REGEX = re.compile(r"[ \t]+\n")
+_SPACE_AFTER_NEWLINE_REGEX = re.compile(r"\n[ \t]+")
+_SPACES_REGEX = re.compile(r"[ \t]+")
+_BLANK_LINES_REGEX = re.compile(r"\n{3,}")
 
 def normalize_whitespace_preserve_paragraphs(text: str) -> str:
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = re.sub(r"[ \t]+\n", "\n", text)
-    text = re.sub(r"\n[ \t]+", "\n", text)
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _CRLF_REGEX.sub("\n", text)
+    text = _SPACE_BEFORE_NEWLINE_REGEX.sub("\n", text)
+    text = _SPACE_AFTER_NEWLINE_REGEX.sub("\n", text)
+    text = _SPACES_REGEX.sub(" ", text)
+    text = _BLANK_LINES_REGEX.sub("\n\n", text)
     return text.strip()
 
+# Joins the text fragments of one paragraph. XML text cannot contain NUL, and for
+# NUM_REGEX it behaves like a string boundary (not a letter, digit, word character
+# or space), so one substitution over the joined fragments matches exactly what
+# separate substitutions per fragment would.
+_FRAGMENT_SEP = "\x00"
+
+def _normalize_fragments(fragments) -> str:
+    if not fragments:
+        return ""
+    return NUM_SCAN_REGEX.sub("<NUM>", _FRAGMENT_SEP.join(fragments)).replace(_FRAGMENT_SEP, "")
+
 def extract_with_tokens(elem, preserve_paragraphs=False):
-    if elem.tag in SPECIAL_TOKENS:
-        return SPECIAL_TOKENS[elem.tag]
-    if preserve_paragraphs and elem.tag == "p":
-        parts = []
-        if elem.text:
-            parts.append(normalize_numbers(elem.text))
-        for child in elem:
-            parts.append(extract_with_tokens(child, preserve_paragraphs))
-            if child.tail:
-                parts.append(normalize_numbers(child.tail))
-        return "".join(parts).strip()
-    parts = []
-    if elem.text:
-        parts.append(normalize_numbers(elem.text))
-    for child in elem:
-        parts.append(extract_with_tokens(child, preserve_paragraphs))
-        if child.tail:
-            parts.append(normalize_numbers(child.tail))
-    return "".join(parts)
+    """Text of elem with special tokens, normalising numbers once per paragraph.
+
+    Walks the tree with lxml's iterwalk instead of recursing. Text fragments are
+    collected in one buffer; nested <p> elements (when preserving paragraphs) get
+    their own buffer, since their text is stripped on its own. Like element children,
+    processing instructions, comments and entities contribute their text and tail.
+    """
+    tag = elem.tag
+    if tag in SPECIAL_TOKENS:
+        return SPECIAL_TOKENS[tag]
+    if not len(elem):
+        text = NUM_SCAN_REGEX.sub("<NUM>", elem.text) if elem.text else ""
+        return text.strip() if preserve_paragraphs and tag == "p" else text
+
+    done, raw = [], []
+    # (done, raw) of the enclosing buffers while inside a nested <p>
+    outer = []
+    walker = etree.iterwalk(elem, events=("start", "end", "pi", "comment"))
+    for event, node in walker:
+        if event == "pi" or event == "comment":
+            # Only reported once, not as start and end
+            if node.text:
+                raw.append(node.text)
+            if node.tail:
+                raw.append(node.tail)
+        elif event == "start":
+            if node is elem:
+                if node.text:
+                    raw.append(node.text)
+                continue
+            token = SPECIAL_TOKENS.get(node.tag)
+            if token is not None:
+                # Tokens contain no digits, so they can share the buffer
+                raw.append(token)
+                walker.skip_subtree()
+                continue
+            if preserve_paragraphs and node.tag == "p":
+                outer.append((done, raw))
+                done, raw = [], []
+            if node.text:
+                raw.append(node.text)
+        elif node is not elem:
+            if preserve_paragraphs and node.tag == "p":
+                done.append(_normalize_fragments(raw))
+                text = "".join(done).strip()
+                done, raw = outer.pop()
+                done.append(_normalize_fragments(raw))
+                done.append(text)
+                raw = []
+            if node.tail:
+                raw.append(node.tail)
+
+    done.append(_normalize_fragments(raw))
+    text = "".join(done)
+    return text.strip() if preserve_paragraphs and tag == "p" else text
 
 def drop_first_last_paragraphs(text: str) -> str:
     paragraphs = text.split("\n\n")
@@ -133,61 +229,302 @@ def drop_first_last_paragraphs(text: str) -> str:
         paragraphs = paragraphs[1:-1]
     return "\n\n".join(paragraphs).strip()
 
+# ---------- Clean a parsed document ----------
+def document_pn(root):
+    """Publication number (e.g. EP1234567B1) from the root element attributes."""
+    country = root.get("country", "") or ""
+    number = root.get("doc-number", "") or ""
+    kind = root.get("kind", "") or ""
+    return f"{country}{number}{kind}".strip()
+
+def clean_root(root):
+    """Cleaned {"pn", "date", "description", "claim1"} record for a parsed document, or None.
+
+    Expects a tree without comments, as produced by `xml_parser`; also used by the
+    scraper's fused `scrape all` mode, which parses each download only once.
+    """
+    desc = root.find(".//description[@lang='en']")
+    if desc is None:
+        return None
+
+    # paragraphs
+    paras = [extract_with_tokens(p, preserve_paragraphs=True) for p in desc.findall(".//p")]
+    paras = [_SPACES_REGEX.sub(" ", p).strip() for p in paras if p]
+    desc_text = "\n\n".join(paras) if paras else extract_with_tokens(desc)
+    desc_text = normalize_whitespace_preserve_paragraphs(desc_text)
+    desc_text = drop_first_last_paragraphs(desc_text)
+
+    # first claim
+    claim1_elem = root.find(".//claims[@lang='en']/claim[@num='0001']")
+    claim1_text = ""
+    if claim1_elem is not None:
+        claim1_text = extract_with_tokens(claim1_elem)
+        claim1_text = normalize_whitespace_preserve_paragraphs(claim1_text)
+
+    if desc_text.strip() or claim1_text.strip():
+        return {
+            "pn": document_pn(root),
+            "date": root.get("date-publ", "") or "",
+            "description": desc_text,
+            "claim1": claim1_text
+        }
+    return None
+
 # ---------- Process a single file ----------
-def process_file(path):
+def clean_bytes(data, name):
+    """Cleaned record for raw XML bytes; parse errors are reported under `name`."""
     try:
-        tree = etree.parse(path, xml_parser)
-        root = tree.getroot()
-
-        desc = root.find(".//description[@lang='en']")
-        if desc is None:
-            return None
-
-        # paragraphs
-        paras = [extract_with_tokens(p, preserve_paragraphs=True) for p in desc.findall(".//p")]
-        paras = [re.sub(r"[ \t]+", " ", p).strip() for p in paras if p]
-        desc_text = "\n\n".join(paras) if paras else extract_with_tokens(desc)
-        desc_text = normalize_whitespace_preserve_paragraphs(desc_text)
-        desc_text = drop_first_last_paragraphs(desc_text)
-
-        # first claim
-        claim1_elem = root.find(".//claims[@lang='en']/claim[@num='0001']")
-        claim1_text = ""
-        if claim1_elem is not None:
-            claim1_text = extract_with_tokens(claim1_elem)
-            claim1_text = normalize_whitespace_preserve_paragraphs(claim1_text)
-
-        if desc_text.strip() or claim1_text.strip():
-            return {
-                "description": desc_text,
-                "claim1": claim1_text
-            }
+        return clean_root(etree.fromstring(data, xml_parser))
     except Exception as e:
-        print(f"Error parsing {path}: {e}")
+        print(f"Error parsing {name}: {e}")
     return None
 
+def with_filename(rec, filename):
+    """Record with the source file name after the publication number."""
+    return {"pn": rec.pop("pn"), "filename": filename, **rec}
+
+# ---------- Incremental state ----------
+def config_fingerprint():
+    """Hash of everything that shapes a cleaned record: tokens, units, regexes and cleaning code."""
+    h = hashlib.sha1()
+    regexes = (NUM_REGEX, NUM_SCAN_REGEX, _CRLF_REGEX, _SPACE_BEFORE_NEWLINE_REGEX,
+               _SPACE_AFTER_NEWLINE_REGEX, _SPACES_REGEX, _BLANK_LINES_REGEX)
+    payload = [SPECIAL_TOKENS, UNITS, [[r.pattern, r.flags] for r in regexes], _FRAGMENT_SEP]
+    h.update(json.dumps(payload).encode("utf-8"))
+    # Hash the functions that apply the tokens and regexes, so code changes count too
+    for fn in (normalize_numbers, normalize_whitespace_preserve_paragraphs, _normalize_fragments,
+               extract_with_tokens, drop_first_last_paragraphs, document_pn, clean_root,
+               clean_bytes, with_filename, process_chunk):
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    return h.hexdigest()
+
+def source_filename(source, input_folder):
+    """Path of a source relative to the input folder; shard members use their virtual YYYYMMDD/N.xml path."""
+    if isinstance(source, ShardRef):
+        source = os.path.join(os.path.dirname(source.shard), source.name)
+    return os.path.relpath(source, input_folder)
+
+def source_stamp(source):
+    """Cheap change marker: [size, mtime_ns] of a file, [length, offset] of a shard member."""
+    if isinstance(source, ShardRef):
+        return [source.length, source.offset]
+    st = os.stat(source)
+    return [st.st_size, st.st_mtime_ns]
+
+def load_manifest(path):
+    """Latest manifest entry per source key, after trimming a torn last line."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        entry = json.loads(line)
+        entries[entry["key"]] = entry
+    return entries
+
+def prepare_state(state_dir, config):
+    """Create the state directory, discarding it first if it was built with another config."""
+    config_path = os.path.join(state_dir, "config")
+    if os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            if f.read().strip() != config:
+                print("Cleaning configuration changed, reprocessing every document")
+                shutil.rmtree(state_dir)
+    os.makedirs(os.path.join(state_dir, "parts"), exist_ok=True)
+    with open(config_path, "w", encoding="utf-8") as f:
+        f.write(config + "\n")
+
+# ---------- Worker parts ----------
+_part = None
+_part_name = None
+_parts_dir = None
+
+def init_worker(parts_dir, run_id):
+    """Name this worker's part file; records never travel back to the parent."""
+    global _part, _part_name, _parts_dir
+    _part = None
+    _part_name = f"part-{run_id}-{os.getpid()}.jsonl"
+    _parts_dir = parts_dir
+
+def open_part():
+    """This worker's part file, created with its first record so unchanged runs add no parts."""
+    global _part
+    if _part is None:
+        _part = open(os.path.join(_parts_dir, _part_name), "ab")
+    return _part
+
+def close_part():
+    global _part
+    if _part is not None:
+        _part.close()
+        _part = None
+
+def process_chunk(tasks):
+    """Clean a batch of (source, filename, stamp, previous entry) tasks into the worker's part file.
+
+    Returns the task count and one manifest entry per readable source. A source whose
+    content hash still matches its previous entry is not parsed again; its entry keeps
+    pointing at the earlier record.
+    """
+    entries = []
+    for source, filename, stamp, previous in tasks:
+        key = source_name(source)
+        try:
+            data = read_source(source)
+        except OSError as e:
+            print(f"Error reading {key}: {e}")
+            continue
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if previous is not None and previous["hash"] == digest:
+            entries.append({**previous, "stamp": stamp})
+            continue
+
+        entry = {"key": key, "stamp": stamp, "hash": digest, "part": None, "offset": 0, "length": 0}
+        rec = clean_bytes(data, key)
+        if rec:
+            line = (json.dumps(with_filename(rec, filename), ensure_ascii=False) + "\n").encode("utf-8")
+            part = open_part()
+            entry.update(part=_part_name, offset=part.tell(), length=len(line))
+            part.write(line)
+        entries.append(entry)
+    # Entries may only reach the manifest once their records are durable
+    if _part is not None:
+        _part.flush()
+        os.fsync(_part.fileno())
+    return len(tasks), entries
+
+def iter_output_lines(sources, entries, parts_dir):
+    """Yield the JSONL record lines the manifest points at, in input order."""
+    parts = {}
+    try:
+        for source in sources:
+            entry = entries.get(source_name(source))
+            if entry is None or not entry["length"]:
+                continue
+            part = parts.get(entry["part"])
+            if part is None:
+                part = parts[entry["part"]] = open(os.path.join(parts_dir, entry["part"]), "rb")
+            part.seek(entry["offset"])
+            yield part.read(entry["length"])
+    finally:
+        for part in parts.values():
+            part.close()
+
+def rewrite_manifest(path, entries):
+    """Replace the manifest atomically with one line per entry, dropping superseded lines."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for entry in entries.values():
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def remove_unreferenced_parts(parts_dir, entries):
+    """Delete part files no manifest entry points at any more, i.e. whose records were all superseded."""
+    referenced = {entry["part"] for entry in entries.values()}
+    for name in os.listdir(parts_dir):
+        if name not in referenced:
+            os.remove(os.path.join(parts_dir, name))
+
+def write_output(output_file, sources, entries, parts_dir, output_format="jsonl", row_group_size=10000):
+    """Assemble the output in input order from the records the manifest points at, atomically."""
+    tmp_file = output_file + ".tmp"
+    lines = iter_output_lines(sources, entries, parts_dir)
+    if output_format == "parquet":
+        from cleaned_table import CleanedTableWriter
+
+        with CleanedTableWriter(tmp_file, row_group_size) as writer:
+            for line in lines:
+                writer.write(json.loads(line))
+    else:
+        with open(tmp_file, "wb") as fout:
+            for line in lines:
+                fout.write(line)
+    os.replace(tmp_file, output_file)
+
 # ---------- Main ----------
-def main(input_folder, output_file, workers=1):
-    xml_files = [os.path.join(dp, f) for dp, dn, fn in os.walk(input_folder) for f in fn if f.endswith(".xml")]
-    with open(output_file, "w", encoding="utf-8") as fout:
+def main(input_folder, output_file, workers=1, chunksize=256, rebuild=False, output_format="jsonl",
+         row_group_size=10000):
+    if output_format == "parquet":
+        # Fail before cleaning rather than after it
+        import pyarrow.parquet  # noqa: F401
+
+    xml_files = sorted(os.path.join(dp, f) for dp, dn, fn in os.walk(input_folder) for f in fn if f.endswith(".xml"))
+    xml_files += list(iter_shard_refs(input_folder))
+
+    state_dir = output_file + ".state"
+    parts_dir = os.path.join(state_dir, "parts")
+    manifest_path = os.path.join(state_dir, "manifest.jsonl")
+    if rebuild:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    prepare_state(state_dir, config_fingerprint())
+    entries = load_manifest(manifest_path)
+
+    tasks = []
+    for source in xml_files:
+        previous = entries.get(source_name(source))
+        try:
+            stamp = source_stamp(source)
+        except OSError:
+            stamp = None
+        if previous is None or previous["stamp"] != stamp:
+            tasks.append((source, source_filename(source, input_folder), stamp, previous))
+    print(f"{len(xml_files) - len(tasks)} of {len(xml_files)} documents unchanged, cleaning {len(tasks)}")
+
+    chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+    # Part files are named after the run; the suffix keeps runs in the same second apart
+    run_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex}"
+    with open(manifest_path, "ab") as manifest, tqdm(total=len(tasks), desc="Processing XML") as progress:
+        def checkpoint(result):
+            done, chunk_entries = result
+            for entry in chunk_entries:
+                manifest.write((json.dumps(entry) + "\n").encode("utf-8"))
+                entries[entry["key"]] = entry
+            manifest.flush()
+            os.fsync(manifest.fileno())
+            progress.update(done)
+
         if workers == 1:
-            for f in tqdm(xml_files, desc="Processing XML"):
-                rec = process_file(f)
-                if rec:
-                    fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            init_worker(parts_dir, run_id)
+            try:
+                for chunk in chunks:
+                    checkpoint(process_chunk(chunk))
+            finally:
+                close_part()
         else:
-            with ProcessPoolExecutor(max_workers=workers) as executor:
-                futures = {executor.submit(process_file, f): f for f in xml_files}
-                for fut in tqdm(as_completed(futures), total=len(futures), desc="Processing XML"):
-                    rec = fut.result()
-                    if rec:
-                        fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            with Pool(workers, initializer=init_worker, initargs=(parts_dir, run_id)) as pool:
+                for result in pool.imap_unordered(process_chunk, chunks):
+                    checkpoint(result)
+                pool.close()
+                pool.join()
+
+    # Forget files that left the input, so their records and parts can go as well
+    current = {source_name(source) for source in xml_files}
+    removed = [key for key in entries if key not in current]
+    for key in removed:
+        del entries[key]
+
+    write_output(output_file, xml_files, entries, parts_dir, output_format, row_group_size)
+    # Before any part goes, so the manifest never points at a deleted part
+    if tasks or removed:
+        rewrite_manifest(manifest_path, entries)
+    remove_unreferenced_parts(parts_dir, entries)
 
 if __name__ == "__main__":
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument("--input_folder", type=str, required=True, help="Top-level XML folder")
-    arg_parser.add_argument("--output_file", type=str, required=True, help="Output JSONL file")
+    arg_parser.add_argument("--output_file", type=str, required=True, help="Output JSONL (or Parquet) file")
     arg_parser.add_argument("--workers", type=int, default=1, help="Number of parallel workers")
+    arg_parser.add_argument("--chunksize", type=int, default=256, help="Files per worker task")
+    arg_parser.add_argument("--rebuild", action="store_true", help="Discard the manifest and clean every file again")
+    arg_parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output file format")
+    arg_parser.add_argument("--row_group_size", type=int, default=10000, help="Records per Parquet row group")
     args = arg_parser.parse_args()
 
-    main(args.input_folder, args.output_file, args.workers)
+    main(args.input_folder, args.output_file, args.workers, args.chunksize, args.rebuild, args.format,
+         args.row_group_size)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+bench_add_documents.py
+
+Benchmark EPODatabase.add_documents on a synthetic discovery against the previous
+row-by-row insert path (one conn.execute per document, reproduced inline below).
+
+Each run starts from an empty database file; the legacy run also recreates the
+single-column date/status indexes the old schema maintained on every insert. The
+synthetic discovery spreads --rows documents evenly over --dates weekly publication
+dates, with URLs shaped like the real ones. A second pass re-adds the same documents
+to time an incremental run in which every URL is already known.
+
+Usage:
+    python bench_add_documents.py [--rows N] [--dates N] [--work-dir DIR]
+
+Arguments:
+    --rows     : int, optional (default: 1000000)
+        Number of synthetic documents
+    --dates    : int, optional (default: 52)
+        Number of publication dates the documents are spread over
+    --work-dir : str, optional (default: system temp directory)
+        Where the temporary database files are created
+
+Example:
+    python bench_add_documents.py --rows 1000000 --dates 52
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+from scraper_epo_pub_server import EPODatabase
+
+
+def build_documents(rows: int, dates: int) -> List[Dict[str, str]]:
+    """Synthetic discovery result: `rows` documents spread over `dates` Wednesdays."""
+    first = date(2024, 1, 3)
+    date_strs = [(first + timedelta(weeks=i)).strftime('%Y%m%d') for i in range(dates)]
+    documents = []
+    for i in range(rows):
+        doc_id = f"EP{i + 1000000:07d}NWB1"
+        documents.append({
+            'url': f"https://data.epo.org/publication-server/rest/v1.2/patents/{doc_id}/document.xml",
+            'date': date_strs[i % dates],
+            'doc_id': doc_id,
+        })
+    return documents
+
+
+LEGACY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date)",
+    "CREATE INDEX IF NOT EXISTS idx_documents_claims_status ON documents (claims_status)",
+    "CREATE INDEX IF NOT EXISTS idx_documents_xml_status ON documents (xml_status)",
+)
+
+
+def legacy_add_documents(db_path: str, documents: List[Dict[str, str]]):
+    """The previous add_documents: one INSERT statement per document."""
+    with sqlite3.connect(db_path) as conn:
+        by_date = {}
+        for doc in documents:
+            by_date.setdefault(doc['date'], []).append(doc)
+
+        for date_str, date_docs in by_date.items():
+            cursor = conn.execute(
+                "SELECT COALESCE(MAX(doc_index), 0) FROM documents WHERE date = ?",
+                (date_str,)
+            )
+            max_index = cursor.fetchone()[0]
+
+            for i, doc in enumerate(date_docs, start=max_index + 1):
+                conn.execute(
+                    "INSERT OR IGNORE INTO documents (url, date, doc_id, doc_index) VALUES (?, ?, ?, ?)",
+                    (doc['url'], doc['date'], doc['doc_id'], i)
+                )
+
+
+def run(label: str, work_dir: str, documents: List[Dict[str, str]], bulk: bool):
+    """Time a fresh insert and a repeated insert of the same documents."""
+    db_path = os.path.join(work_dir, f"bench_{label}.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    db = EPODatabase(db_path)
+    db.add_dates(sorted({doc['date'] for doc in documents}))
+    if not bulk:
+        with sqlite3.connect(db_path) as conn:
+            for statement in LEGACY_INDEXES:
+                conn.execute(statement)
+    add = db.add_documents if bulk else (lambda docs: legacy_add_documents(db_path, docs))
+
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        add(documents)
+        timings.append(time.perf_counter() - start)
+
+    with sqlite3.connect(db_path) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    print(f"{label:>7}: fresh {timings[0]:7.2f}s ({len(documents) / timings[0]:9.0f} rows/sec)  "
+          f"re-run {timings[1]:7.2f}s  stored {stored}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk vs row-by-row document inserts")
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of synthetic documents")
+    parser.add_argument("--dates", type=int, default=52, help="Number of publication dates")
+    parser.add_argument("--work-dir", default=None, help="Directory for the temporary databases")
+    args = parser.parse_args()
+
+    documents = build_documents(args.rows, args.dates)
+    print(f"Inserting {len(documents)} documents over {args.dates} dates")
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        legacy = run("legacy", work_dir, documents, bulk=False)
+        bulk = run("bulk", work_dir, documents, bulk=True)
+
+    print(f"speedup: fresh {legacy[0] / bulk[0]:.2f}x, re-run {legacy[1] / bulk[1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+bench_boilerplate.py
+
+Benchmark boilerplate.BoilerplateMatcher against the paragraph and sentence
+boilerplate loops of notebooks 6 and 7 (reproduced inline below) on a cleaned JSONL
+file, in MB/s of description text. Paragraph removal must produce identical text.
+Sentence removal uses sentence_splitter, which deliberately splits differently
+from the notebook (not after "FIG.", "No.", ... nor at dots without a following
+space), so for sentences the number of differing documents is only reported.
+
+Without blacklist files, one is mined from the sample itself: every paragraph seen
+at least --freq-threshold times, and the sentences of those paragraphs.
+
+Usage:
+    python bench_boilerplate.py --input <CLEANED_JSONL> [--paragraph-blacklist F] [--sentence-blacklist F]
+                                [--limit N] [--repeat N]
+
+Arguments:
+    --input               : str
+        Cleaned JSONL, ideally the output of the para stage of clean_pipeline.py
+    --paragraph-blacklist : str, optional
+        Paragraph blacklist JSONL (default: mined from the sample)
+    --sentence-blacklist  : str, optional
+        Sentence blacklist JSONL (default: seeded from the paragraph blacklist)
+    --freq-threshold      : int, optional (default: 3)
+        Occurrences for a paragraph to be mined into the blacklist
+    --limit               : int, optional (default: 20000)
+        Maximum number of records to load
+    --repeat              : int, optional (default: 3)
+        Timed passes per implementation; the fastest pass is reported
+
+Example:
+    python bench_boilerplate.py --input cleaned_patents.para.jsonl --paragraph-blacklist boilerplate_blacklist.jsonl \\
+        --sentence-blacklist sentence_blacklist.jsonl
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from boilerplate import BoilerplateMatcher, load_blacklist
+from sentence_splitter import split_sentences
+
+
+# ---------- Notebooks 6 and 7 ----------
+LEGACY_ABBREVIATIONS = ["e.g.", "i.e.", "etc.", "vs.", "No.", "Fig.", "Eq.", "Ref."]
+LEGACY_DECIMAL_REGEX = re.compile(r"\d+\.\d+")
+
+
+def legacy_split_into_sentences(text):
+    decimals = {}
+
+    def decimal_replacer(match):
+        key = f"__DECIMAL_{len(decimals)}__"
+        decimals[key] = match.group(0)
+        return key
+
+    text = LEGACY_DECIMAL_REGEX.sub(decimal_replacer, text)
+    for abbr in LEGACY_ABBREVIATIONS:
+        text = text.replace(abbr, abbr.replace(".", "__DOT__"))
+    sentences = [s.strip() for s in text.split(".") if s.strip()]
+    restored = []
+    for s in sentences:
+        for key, val in decimals.items():
+            s = s.replace(key, val)
+        s = s.replace("__DOT__", ".")
+        restored.append(s)
+    return restored
+
+
+def legacy_strip_paragraphs(text, blacklist):
+    paras = [p for p in text.split("\n\n") if p.strip()]
+    return "\n\n".join(p for p in paras if p not in blacklist).strip()
+
+
+def legacy_strip_sentences(text, blacklist, min_len=10):
+    cleaned_paras = []
+    for para in text.split("\n\n"):
+        if not para.strip():
+            continue
+        kept = [s for s in legacy_split_into_sentences(para) if s not in blacklist and len(s) >= min_len]
+        if kept:
+            cleaned_paras.append(". ".join(kept) + ".")
+    return "\n\n".join(cleaned_paras)
+
+
+# ---------- Benchmark ----------
+def mine_blacklists(texts, freq_threshold):
+    counter = Counter(p.strip() for text in texts for p in text.split("\n\n") if p.strip())
+    paragraphs = {p for p, count in counter.items() if count >= freq_threshold}
+    sentences = {s for p in paragraphs for s in split_sentences(p) if len(s) >= 20}
+    return paragraphs, sentences
+
+
+def run(strip, texts, repeat):
+    """Fastest of `repeat` passes over all texts, plus the stripped texts."""
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [strip(text) for text in texts]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def report(name, legacy, new, megabytes, label="mismatches"):
+    (legacy_time, legacy_texts), (new_time, new_texts) = legacy, new
+    mismatches = sum(1 for old, text in zip(legacy_texts, new_texts) if old != text)
+    print(f"{name}:")
+    print(f"  notebook: {legacy_time:7.3f}s  ({megabytes / legacy_time:8.1f} MB/s)")
+    print(f"  matcher:  {new_time:7.3f}s  ({megabytes / new_time:8.1f} MB/s)")
+    print(f"  speedup: {legacy_time / new_time:.2f}x, {label}: {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark boilerplate removal against notebooks 6 and 7")
+    parser.add_argument("--input", required=True, help="Cleaned JSONL")
+    parser.add_argument("--paragraph-blacklist", help="Paragraph blacklist JSONL")
+    parser.add_argument("--sentence-blacklist", help="Sentence blacklist JSONL")
+    parser.add_argument("--freq-threshold", type=int, default=3, help="Occurrences for a mined paragraph")
+    parser.add_argument("--limit", type=int, default=20000, help="Maximum number of records to load")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per implementation")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        texts = [json.loads(line).get("description", "") for line in islice(f, args.limit)]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+
+    paragraphs, sentences = mine_blacklists(texts, args.freq_threshold)
+    if args.paragraph_blacklist:
+        paragraphs = load_blacklist(args.paragraph_blacklist)
+    if args.sentence_blacklist:
+        sentences = load_blacklist(args.sentence_blacklist)
+    matcher = BoilerplateMatcher(paragraphs, sentences)
+    print(f"{len(texts)} descriptions ({megabytes:.1f} MB), "
+          f"{len(paragraphs)} blacklisted paragraphs, {len(sentences)} blacklisted sentences")
+
+    mismatches = report("paragraphs",
+                        run(lambda text: legacy_strip_paragraphs(text, paragraphs), texts, args.repeat),
+                        run(lambda text: matcher.strip_paragraphs(text)[0], texts, args.repeat),
+                        megabytes)
+    report("sentences",
+           run(lambda text: legacy_strip_sentences(text, sentences), texts, args.repeat),
+           run(lambda text: matcher.strip_sentences(text)[0], texts, args.repeat),
+           megabytes, label="documents split differently")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
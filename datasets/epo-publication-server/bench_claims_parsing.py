@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+bench_claims_parsing.py
+
+Micro-benchmark the DOM (etree.fromstring + XPath) and streaming (pull parser for the
+root, English claims blocks only, iterparse fallback) claims extractors from
+scraper_epo_pub_server.py on a corpus of saved XML files, e.g. the output of `scrape xml`.
+
+Each parser runs in its own fresh process so the reported peak RSS belongs to that
+parser alone. Files are read from disk one at a time inside the timed loop, exactly
+as the scraper sees response bodies, and every result is fingerprinted so the two
+parsers can be checked for identical output.
+
+Usage:
+    python bench_claims_parsing.py --xml-dir XML_DIR [--limit N] [--repeat N]
+
+Arguments:
+    --xml-dir : str, required
+        Directory containing saved XML files (searched recursively)
+    --limit   : int, optional (default: 0, all files)
+        Only benchmark the first N files (sorted by path)
+    --repeat  : int, optional (default: 1)
+        Parse the corpus this many times per parser
+
+Example:
+    python bench_claims_parsing.py --xml-dir xml_data --limit 2000 --repeat 3
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+from scraper_epo_pub_server import CLAIM_PARSERS
+
+
+def run_parser(parser_name: str, paths: List[str], repeat: int) -> Tuple[float, int, int, List[str]]:
+    """Parse every file `repeat` times; return elapsed seconds, bytes, peak RSS (KB) and result fingerprints."""
+    extract = CLAIM_PARSERS[parser_name]
+    fingerprints = []
+    total_bytes = 0
+
+    start = time.perf_counter()
+    for iteration in range(repeat):
+        for path in paths:
+            with open(path, "rb") as f:
+                xml_bytes = f.read()
+            total_bytes += len(xml_bytes)
+            try:
+                result = json.dumps(extract(xml_bytes), ensure_ascii=False)
+            except Exception as e:
+                result = f"error: {type(e).__name__}"
+            if iteration == 0:
+                fingerprints.append(hashlib.md5(result.encode("utf-8")).hexdigest())
+    elapsed = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, total_bytes, peak_rss, fingerprints
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOM vs streaming claims extraction")
+    parser.add_argument("--xml-dir", required=True, help="Directory of saved XML files")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N files")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus per parser")
+    args = parser.parse_args()
+
+    paths = sorted(str(p) for p in Path(args.xml_dir).rglob("*.xml"))
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        parser.error(f"No XML files found in {args.xml_dir}")
+
+    print(f"Benchmarking {len(paths)} files x {args.repeat} passes")
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in ("dom", "stream"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            elapsed, total_bytes, peak_rss, fingerprints = executor.submit(
+                run_parser, name, paths, args.repeat
+            ).result()
+        results[name] = fingerprints
+        docs = len(paths) * args.repeat
+        print(f"{name:>7}: {docs / elapsed:8.1f} docs/sec  {total_bytes / elapsed / 1e6:7.1f} MB/s  "
+              f"peak RSS {peak_rss / 1024:.1f} MB")
+
+    mismatches = [path for path, a, b in zip(paths, results["dom"], results["stream"]) if a != b]
+    print(f"Identical output: {len(paths) - len(mismatches)}/{len(paths)} files")
+    for path in mismatches[:10]:
+        print(f"  mismatch: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+bench_extract_with_tokens.py
+
+Benchmark extract_with_tokens from 2-coarse_cleaning.py against the previous
+recursive implementation (reproduced inline below, with number normalisation on
+NUM_REGEX itself) on a sample of XML documents, and check that both produce
+identical text.
+
+Every document is parsed once up front with the cleaning script's parser; the
+timed loop then extracts every English description paragraph (preserving
+paragraphs) and the first English claim, exactly as clean_root does. Any
+difference between the two implementations is reported and fails the run.
+
+Real documents rarely contain processing instructions, comments or unresolved
+entities, so the equivalence check also covers --synthetic randomly generated
+trees mixing them with nested elements, special tokens and numbers (not timed).
+
+Usage:
+    python bench_extract_with_tokens.py --input_folder <XML_ROOT_FOLDER> [--limit N] [--repeat N]
+
+Arguments:
+    --input_folder : str
+        Folder with XML files and/or shards (same layout 2-coarse_cleaning.py reads)
+    --limit        : int, optional (default: 2000)
+        Maximum number of documents to load
+    --repeat       : int, optional (default: 3)
+        Timed passes per implementation; the fastest pass is reported
+    --synthetic    : int, optional (default: 5000)
+        Random trees with processing instructions, comments and entities to compare
+
+Example:
+    python bench_extract_with_tokens.py --input_folder xml_data --limit 5000
+"""
+
+import argparse
+import importlib
+import random
+import sys
+import time
+
+from lxml import etree
+
+from xml_store import find_xml_sources, read_source
+
+cleaning = importlib.import_module("2-coarse_cleaning")
+
+
+def legacy_normalize_numbers(text):
+    """The previous normalize_numbers, on NUM_REGEX itself."""
+    if not text:
+        return ""
+    return cleaning.NUM_REGEX.sub("<NUM>", text)
+
+
+def legacy_extract_with_tokens(elem, preserve_paragraphs=False):
+    """The previous extractor: recursive, one NUM_REGEX.sub per text fragment."""
+    if elem.tag in cleaning.SPECIAL_TOKENS:
+        return cleaning.SPECIAL_TOKENS[elem.tag]
+    if preserve_paragraphs and elem.tag == "p":
+        parts = []
+        if elem.text:
+            parts.append(legacy_normalize_numbers(elem.text))
+        for child in elem:
+            parts.append(legacy_extract_with_tokens(child, preserve_paragraphs))
+            if child.tail:
+                parts.append(legacy_normalize_numbers(child.tail))
+        return "".join(parts).strip()
+    parts = []
+    if elem.text:
+        parts.append(legacy_normalize_numbers(elem.text))
+    for child in elem:
+        parts.append(legacy_extract_with_tokens(child, preserve_paragraphs))
+        if child.tail:
+            parts.append(legacy_normalize_numbers(child.tail))
+    return "".join(parts)
+
+
+def load_targets(input_folder, limit):
+    """(element, preserve_paragraphs) pairs for every paragraph and first claim, as clean_root extracts them."""
+    targets = []
+    for source in find_xml_sources(input_folder)[:limit]:
+        try:
+            root = etree.fromstring(read_source(source), cleaning.xml_parser)
+        except etree.XMLSyntaxError:
+            continue
+        if root is None:
+            continue
+        desc = root.find(".//description[@lang='en']")
+        if desc is not None:
+            paragraphs = desc.findall(".//p")
+            targets += [(p, True) for p in paragraphs] if paragraphs else [(desc, False)]
+        claim1 = root.find(".//claims[@lang='en']/claim[@num='0001']")
+        if claim1 is not None:
+            targets.append((claim1, False))
+    return targets
+
+
+def synthetic_targets(count, seed=0):
+    """(element, preserve_paragraphs) pairs of random trees with PIs, comments and entities."""
+    rng = random.Random(seed)
+    words = ["valve", "5", "12.5 mm", "3kg", "x2", "of", "7 %", "", "\n"]
+    tags = ["p", "b", "i", "sub", "figref", "table", "maths", "li"]
+
+    def text():
+        return " ".join(rng.choice(words) for _ in range(rng.randrange(4)))
+
+    def node(depth):
+        kind = rng.random()
+        if kind < 0.12:
+            return f"<?pi {text()}?>{text()}"
+        if kind < 0.22:
+            return f"<!--{text()}-->{text()}"
+        if kind < 0.3:
+            return f"&ent;{text()}"
+        if depth > 3 or kind < 0.4:
+            return text()
+        tag = rng.choice(tags)
+        return f"<{tag}>{text()}{''.join(node(depth + 1) for _ in range(rng.randrange(4)))}</{tag}>{text()}"
+
+    # The cleaning parser, plus ones that keep comments or leave entities unresolved
+    parsers = [cleaning.xml_parser, etree.XMLParser(recover=True),
+               etree.XMLParser(recover=True, resolve_entities=False)]
+    targets = []
+    for _ in range(count):
+        doc = f'<!DOCTYPE p [<!ENTITY ent "e 9">]><p>{text()}{"".join(node(0) for _ in range(rng.randrange(1, 5)))}</p>'
+        root = etree.fromstring(doc.encode("utf-8"), rng.choice(parsers))
+        targets += [(root, True), (root, False)]
+    return targets
+
+
+def run(extract, targets, repeat):
+    """Fastest of `repeat` passes over all targets, plus the extracted texts."""
+    best = float("inf")
+    texts = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = [extract(elem, preserve) for elem, preserve in targets]
+        best = min(best, time.perf_counter() - start)
+    return best, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the iterative vs recursive extract_with_tokens")
+    parser.add_argument("--input_folder", required=True, help="Folder with XML files and/or shards")
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum number of documents to load")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per implementation")
+    parser.add_argument("--synthetic", type=int, default=5000,
+                        help="Random trees with PIs, comments and entities to compare")
+    args = parser.parse_args()
+
+    targets = load_targets(args.input_folder, args.limit)
+    print(f"Extracting {len(targets)} paragraphs and claims")
+
+    legacy_time, legacy_texts = run(legacy_extract_with_tokens, targets, args.repeat)
+    new_time, new_texts = run(cleaning.extract_with_tokens, targets, args.repeat)
+
+    mismatches = sum(1 for old, new in zip(legacy_texts, new_texts) if old != new)
+    print(f"recursive: {legacy_time:7.3f}s  ({len(targets) / legacy_time:9.0f} elements/sec)")
+    print(f"iterative: {new_time:7.3f}s  ({len(targets) / new_time:9.0f} elements/sec)")
+    print(f"speedup: {legacy_time / new_time:.2f}x, mismatches: {mismatches}")
+
+    synthetic = synthetic_targets(args.synthetic)
+    synthetic_mismatches = sum(1 for elem, preserve in synthetic
+                               if legacy_extract_with_tokens(elem, preserve)
+                               != cleaning.extract_with_tokens(elem, preserve))
+    print(f"synthetic trees with PIs, comments and entities: {synthetic_mismatches}/{len(synthetic)} mismatches")
+    if mismatches or synthetic_mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
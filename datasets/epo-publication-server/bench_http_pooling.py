@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+bench_http_pooling.py
+
+Benchmark EPOScraper document fetching with and without pooled keep-alive sessions
+against a local HTTP stand-in for data.epo.org.
+
+The stand-in server speaks HTTP/1.1 with keep-alive, serves a synthetic
+document.xml for every /publication-server/.../document.xml path and gzips the
+body when the client asks for it. To mimic the TCP+TLS handshake cost of the real
+server, every *new* connection is delayed by --connect-delay-ms before the first
+request is handled; reused connections skip that delay.
+
+Usage:
+    python bench_http_pooling.py [--docs N] [--max-workers N] [--connect-delay-ms MS] [--doc-kb KB]
+
+Arguments:
+    --docs             : int, optional (default: 2000)
+        Number of document fetches per run
+    --max-workers      : int, optional (default: 12)
+        Worker threads, same meaning as the scraper's --max-workers
+    --connect-delay-ms : float, optional (default: 20)
+        Simulated handshake latency applied once per new connection
+    --doc-kb           : int, optional (default: 200)
+        Approximate size of the synthetic document.xml in kilobytes
+
+Example:
+    python bench_http_pooling.py --docs 5000 --max-workers 12 --connect-delay-ms 30
+"""
+
+import argparse
+import gzip
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scraper_epo_pub_server import EPOScraper
+
+
+def build_document(doc_kb: int) -> bytes:
+    """Build a synthetic EP patent XML document of roughly doc_kb kilobytes."""
+    paragraph = "<p>The device comprises a housing of 20 mm and a sensor coupled to the controller.</p>"
+    repeats = max(1, doc_kb * 1024 // len(paragraph))
+    body = "".join(paragraph for _ in range(repeats))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<ep-patent-document country="EP" doc-number="1234567" kind="B1">'
+        f'<description lang="en">{body}</description>'
+        '<claims lang="en"><claim num="0001"><claim-text>A device.</claim-text></claim></claims>'
+        '</ep-patent-document>'
+    ).encode("utf-8")
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded keep-alive HTTP server with a simulated per-connection handshake."""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, document: bytes, connect_delay: float):
+        self.document = document
+        self.document_gzip = gzip.compress(document)
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self._lock = threading.Lock()
+        super().__init__(address, StandInHandler)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve the synthetic document for every GET."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls on reused connections
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server._lock:
+            self.server.connections += 1
+        time.sleep(self.server.connect_delay)
+
+    def do_GET(self):
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.server.document_gzip
+            encoding = "gzip"
+        else:
+            body = self.server.document
+            encoding = None
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(base_url: str, docs: int, max_workers: int, pooled: bool) -> float:
+    """Fetch `docs` documents through EPOScraper and return documents per second."""
+    # Pin the rate limiter far above what a local server can serve: this measures connection reuse, not pacing
+    scraper = EPOScraper(max_workers=max_workers, pooled=pooled, rate=1e6, max_rate=1e6)
+    urls = [f"{base_url}/publication-server/rest/v1.2/patents/EP{i:07d}NWB1/document.xml" for i in range(docs)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers) as executor:
+        responses = list(executor.map(scraper._get_response, urls))
+    elapsed = time.perf_counter() - start
+    scraper.close()
+
+    failed = sum(1 for response in responses if response is None)
+    if failed:
+        print(f"  warning: {failed} requests failed")
+    return docs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-request HTTP fetching")
+    parser.add_argument("--docs", type=int, default=2000, help="Document fetches per run")
+    parser.add_argument("--max-workers", type=int, default=12, help="Worker threads")
+    parser.add_argument("--connect-delay-ms", type=float, default=20, help="Simulated handshake latency per new connection")
+    parser.add_argument("--doc-kb", type=int, default=200, help="Approximate document size in KB")
+    args = parser.parse_args()
+
+    server = StandInServer(("127.0.0.1", 0), build_document(args.doc_kb), args.connect_delay_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"Stand-in server at {base_url}: {args.docs} docs, {args.max_workers} workers, "
+          f"{args.connect_delay_ms:.0f} ms handshake, {len(server.document) // 1024} KB documents")
+
+    results = {}
+    for label, pooled in (("per-request", False), ("pooled", True)):
+        server.connections = 0
+        rate = run(base_url, args.docs, args.max_workers, pooled)
+        results[label] = rate
+        print(f"{label:>12}: {rate:8.1f} docs/sec ({server.connections} connections opened)")
+
+    print(f"     speedup: {results['pooled'] / results['per-request']:.2f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+boilerplate.py
+
+Boilerplate removal for cleaned descriptions: drop paragraphs found in the
+paragraph blacklist (notebook 6) and sentences found in the sentence blacklist or
+shorter than `min_sentence_len` (notebook 7).
+
+Blacklist entries are whole paragraphs or sentences, never substrings, so matching
+is an exact lookup of each paragraph or stripped sentence in a hashed set, not a
+multi-pattern substring search. What used to be slow is the sentence splitting:
+notebook 7 ran one str.replace per abbreviation plus one per decimal placeholder
+on every paragraph. Sentences now come from sentence_splitter, which finds the
+sentence and paragraph boundaries of a whole description in one scan.
+
+Blacklists are JSONL files with one {"text", "total_count", "doc_count"} line per
+entry, as written by `clean_pipeline.py mine-paragraphs` / `seed-sentences`.
+"""
+
+import json
+from pathlib import Path
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from sentence_splitter import paragraph_spans
+
+
+def load_blacklist(path: Path) -> FrozenSet[str]:
+    """Texts of a blacklist JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        return frozenset(json.loads(line)["text"] for line in f)
+
+
+class BoilerplateMatcher:
+    """Strip blacklisted paragraphs and sentences from "\\n\\n"-separated descriptions."""
+
+    def __init__(self, paragraphs: Iterable[str] = (), sentences: Iterable[str] = (), min_sentence_len: int = 10):
+        self.paragraphs = frozenset(paragraphs)
+        self.sentences = frozenset(sentences)
+        self.min_sentence_len = min_sentence_len
+
+    @classmethod
+    def from_files(cls, paragraph_path: Optional[Path] = None, sentence_path: Optional[Path] = None,
+                   min_sentence_len: int = 10) -> "BoilerplateMatcher":
+        return cls(load_blacklist(paragraph_path) if paragraph_path else (),
+                   load_blacklist(sentence_path) if sentence_path else (),
+                   min_sentence_len)
+
+    def strip_paragraphs(self, text: str) -> Tuple[str, int]:
+        """Text without blacklisted or blank paragraphs, and the number of blacklisted ones removed."""
+        blacklist = self.paragraphs
+        paragraphs = [p for p in text.split("\n\n") if p.strip()]
+        kept = [p for p in paragraphs if p not in blacklist]
+        return "\n\n".join(kept).strip(), len(paragraphs) - len(kept)
+
+    def strip_sentences(self, text: str) -> Tuple[str, int]:
+        """Text without blacklisted or short sentences, and the number of sentences removed.
+
+        Kept sentences of a paragraph are joined with ". " and end with "." (unless the
+        last one already does, e.g. "FIG."); paragraphs left without sentences are dropped.
+        """
+        blacklist = self.sentences
+        min_len = self.min_sentence_len
+        paragraphs = []
+        removed = 0
+        for spans in paragraph_spans(text):
+            sentences = [text[start:end] for start, end in spans]
+            kept = [s for s in sentences if len(s) >= min_len and s not in blacklist]
+            removed += len(sentences) - len(kept)
+            if kept:
+                paragraph = ". ".join(kept)
+                paragraphs.append(paragraph if paragraph.endswith(".") else paragraph + ".")
+        return "\n\n".join(paragraphs), removed
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+clean_pipeline.py
+
+Streaming version of the cleaning notebooks that follow 2-coarse_cleaning.py:
+
+    tail      3-removing_tail.ipynb             drop documents outside description/claim1
+                                                length percentiles (default 2%-90%)
+    dedup     4-exact_dedup.ipynb               drop exact duplicates of claim1, then of
+                                                the description (first occurrence wins),
+                                                compared by 128-bit digest
+    para      5-paragraph_clean.ipynb           drop paragraphs shorter than 40 or longer
+                                                than 10240 characters and repeated paragraphs
+    para-bp   6-boilerplate_removal_paragraphs  drop blacklisted paragraphs
+    sent-bp   7-boilerplate_sentences           drop blacklisted and very short sentences
+
+The notebooks each load the whole JSONL into a list and write a new intermediate
+file. Here every stage is a generator over records, and the stages are chained, so
+the corpus is read once and written once. Only the tail cut needs to see the whole
+corpus first: a pre-pass keeps just the description and claim1 lengths (4 bytes
+each per document, or only the two length columns of a Parquet input) to find its
+percentile cutoffs, and the records then stream through the cutoff. Intermediate
+files are written only for stages named with --save-after, and the run ends with a
+per-stage report of records in/out, drops and the time spent inside each stage.
+
+Records keep every key of the input (pn, filename, date, ...); stages only rewrite
+"description". Input may be JSONL or the Parquet table of
+`2-coarse_cleaning.py --format parquet`.
+
+The blacklists come from the boilerplate mining steps of notebooks 6 and 7:
+    mine-paragraphs   count paragraphs after tail/dedup/para and write every paragraph
+                      seen at least --freq-threshold times (boilerplate_blacklist.jsonl)
+    seed-sentences    split a paragraph blacklist into sentences (sentence_blacklist.jsonl)
+
+Examples:
+    python clean_pipeline.py mine-paragraphs --input coarse_cleaned_patents.jsonl
+    python clean_pipeline.py seed-sentences
+    python clean_pipeline.py run --input coarse_cleaned_patents.jsonl --output cleaned.jsonl \\
+        --save-after dedup
+"""
+
+import hashlib
+import json
+import shutil
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import typer
+from typing_extensions import Annotated
+from tqdm import tqdm
+
+from boilerplate import BoilerplateMatcher, load_blacklist
+from cleaned_table import text_hash
+from digest_set import DigestSet
+from sentence_splitter import split_sentences
+
+
+app = typer.Typer(help="Stream cleaned patents through the tail/dedup/paragraph/boilerplate stages")
+
+STAGES = ("tail", "dedup", "para", "para-bp", "sent-bp")
+
+
+# ---------- Records ----------
+def read_records(path: Path, columns: Optional[List[str]] = None) -> Iterator[Dict]:
+    """Yield records from a JSONL file or a cleaned Parquet table."""
+    if path.suffix == ".parquet":
+        from cleaned_table import TEXT_COLUMNS, iter_records
+
+        yield from iter_records(str(path), columns or list(TEXT_COLUMNS))
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def write_records(records: Iterable[Dict], path: Path) -> int:
+    """Write records as JSONL, returning how many were written."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as fout:
+        for rec in records:
+            fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def tee_records(records: Iterable[Dict], path: Path) -> Iterator[Dict]:
+    """Pass records through while also writing them to path."""
+    with open(path, "w", encoding="utf-8") as fout:
+        for rec in records:
+            fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            yield rec
+
+
+def paragraphs_of(description: str) -> List[str]:
+    """Non-empty, stripped "\\n\\n"-separated paragraphs."""
+    return [p.strip() for p in description.split("\n\n") if p.strip()]
+
+
+# ---------- Stages ----------
+class Stage(ABC):
+    """One cleaning step: process() returns the (possibly rewritten) record, or None to drop it."""
+
+    name = ""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clear statistics and any state, so the stage can run over the input again."""
+        self.records_in = 0
+        self.records_out = 0
+        self.seconds = 0.0
+        self.counters: Counter = Counter()
+
+    @abstractmethod
+    def process(self, rec: Dict) -> Optional[Dict]:
+        """The record after this stage, or None to drop it."""
+
+    def run(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Generator applying process() to records, timing only this stage's own work."""
+        for rec in records:
+            self.records_in += 1
+            start = time.perf_counter()
+            rec = self.process(rec)
+            self.seconds += time.perf_counter() - start
+            if rec is not None:
+                self.records_out += 1
+                yield rec
+
+
+class TailCut(Stage):
+    """Keep documents whose stripped description and claim1 lengths lie within the cutoffs."""
+
+    name = "tail"
+
+    def __init__(self, desc_range: Tuple[float, float], claim_range: Tuple[float, float]):
+        super().__init__()
+        self.desc_low, self.desc_high = desc_range
+        self.claim_low, self.claim_high = claim_range
+
+    def process(self, rec):
+        desc_length = len(rec.get("description", "").strip())
+        claim_length = len(rec.get("claim1", "").strip())
+        if self.desc_low <= desc_length <= self.desc_high and self.claim_low <= claim_length <= self.claim_high:
+            return rec
+        return None
+
+
+class ExactDedup(Stage):
+    """Drop records whose claim1, or else whose description, was already kept.
+
+    Texts are compared by the 128-bit blake2b digest of their stripped form, kept
+    in compact DigestSets rather than as strings.
+    """
+
+    name = "dedup"
+
+    def reset(self):
+        super().reset()
+        self.seen_claims = DigestSet()
+        self.seen_descs = DigestSet()
+
+    def process(self, rec):
+        if not self.seen_claims.add_new(text_hash(rec.get("claim1", "").strip())):
+            self.counters["claim1 duplicates"] += 1
+            return None
+        if not self.seen_descs.add_new(text_hash(rec.get("description", "").strip())):
+            self.counters["description duplicates"] += 1
+            return None
+        return rec
+
+
+class ParagraphClean(Stage):
+    """Drop too short or too long paragraphs and repeats within a document."""
+
+    name = "para"
+
+    def __init__(self, min_len: int = 40, max_len: int = 10240):
+        super().__init__()
+        self.min_len = min_len
+        self.max_len = max_len
+
+    def process(self, rec):
+        paras = paragraphs_of(rec["description"])
+        kept = [p for p in paras if self.min_len <= len(p) <= self.max_len]
+        unique = list(dict.fromkeys(kept))
+        self.counters["paragraphs removed"] += len(paras) - len(unique)
+        rec["description"] = "\n\n".join(unique)
+        return rec
+
+
+class ParagraphBoilerplate(Stage):
+    """Drop blacklisted paragraphs; drop the document if nothing is left."""
+
+    name = "para-bp"
+
+    def __init__(self, matcher: BoilerplateMatcher):
+        super().__init__()
+        self.matcher = matcher
+
+    def process(self, rec):
+        rec["description"], removed = self.matcher.strip_paragraphs(rec["description"])
+        self.counters["paragraphs removed"] += removed
+        if rec["description"] or rec["claim1"].strip():
+            return rec
+        return None
+
+
+class SentenceBoilerplate(Stage):
+    """Drop blacklisted sentences and sentences shorter than the matcher's minimum length."""
+
+    name = "sent-bp"
+
+    def __init__(self, matcher: BoilerplateMatcher):
+        super().__init__()
+        self.matcher = matcher
+
+    def process(self, rec):
+        rec["description"], removed = self.matcher.strip_sentences(rec["description"])
+        self.counters["sentences removed"] += removed
+        return rec
+
+
+# ---------- Blacklist mining ----------
+def paragraph_hash(text: str) -> int:
+    """64-bit blake2b hash of a paragraph, as an unsigned int."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ParagraphCounter:
+    """Exact total and document counts of paragraph hashes, spilled to sharded files.
+
+    Hashes are buffered in compact arrays and appended to one of `shards` files by
+    hash modulo `shards`; counting then loads a single shard at a time. Memory is bounded
+    by the buffer and the largest shard, not by the number of distinct paragraphs,
+    and no paragraph text is kept.
+    """
+
+    def __init__(self, work_dir: Path, shards: int = 64, buffer_size: int = 1 << 22):
+        self.work_dir = work_dir
+        self.shards = shards
+        self.buffer_size = buffer_size
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._totals = array("Q")
+        self._docs = array("Q")
+
+    def _path(self, kind: str, shard: int) -> Path:
+        return self.work_dir / f"{kind}-{shard:03d}.u64"
+
+    def add_document(self, paragraphs: List[str]):
+        hashes = [paragraph_hash(p) for p in paragraphs]
+        self._totals.extend(hashes)
+        self._docs.extend(set(hashes))
+        if len(self._totals) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered hashes to their shard files."""
+        for kind, buffer in (("total", self._totals), ("docs", self._docs)):
+            hashes = np.frombuffer(buffer, dtype=np.uint64)
+            shard_ids = (hashes % np.uint64(self.shards)).astype(np.int64)
+            order = np.argsort(shard_ids, kind="stable")
+            bounds = np.searchsorted(shard_ids[order], np.arange(self.shards + 1))
+            for shard in range(self.shards):
+                if bounds[shard] < bounds[shard + 1]:
+                    with open(self._path(kind, shard), "ab") as f:
+                        f.write(hashes[order[bounds[shard]:bounds[shard + 1]]].tobytes())
+        self._totals = array("Q")
+        self._docs = array("Q")
+
+    def heavy_hitters(self, threshold: int) -> Dict[int, Tuple[int, int]]:
+        """{hash: (total count, document count)} of the paragraphs seen at least threshold times."""
+        self.flush()
+        counts = {}
+        for shard in range(self.shards):
+            if not self._path("total", shard).exists():
+                continue
+            hashes, totals = np.unique(np.fromfile(self._path("total", shard), dtype=np.uint64), return_counts=True)
+            heavy = totals >= threshold
+            if not heavy.any():
+                continue
+            doc_hashes, docs = np.unique(np.fromfile(self._path("docs", shard), dtype=np.uint64), return_counts=True)
+            heavy_hashes = hashes[heavy]
+            heavy_docs = docs[np.searchsorted(doc_hashes, heavy_hashes)]
+            counts.update(zip(heavy_hashes.tolist(), zip(totals[heavy].tolist(), heavy_docs.tolist())))
+        return counts
+
+
+# ---------- Pipeline ----------
+def read_lengths(input_path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """Stripped description and claim1 lengths of every input record, as int32 arrays.
+
+    Parquet tables already store them (the cleaner strips both fields), so only the
+    two length columns are read. For JSONL the lengths are appended to compact
+    4-byte arrays while streaming, and the records themselves are discarded.
+    """
+    if input_path.suffix == ".parquet":
+        from cleaned_table import read_columns
+
+        table = read_columns(str(input_path), ["description_chars", "claim1_chars"])
+        return (table.column("description_chars").to_numpy().astype(np.int32, copy=False),
+                table.column("claim1_chars").to_numpy().astype(np.int32, copy=False))
+
+    desc_lengths = array("i")
+    claim_lengths = array("i")
+    for rec in tqdm(read_records(input_path), desc="Measuring lengths"):
+        desc_lengths.append(len(rec.get("description", "").strip()))
+        claim_lengths.append(len(rec.get("claim1", "").strip()))
+    return np.frombuffer(desc_lengths, dtype=np.int32), np.frombuffer(claim_lengths, dtype=np.int32)
+
+
+def length_cutoffs(input_path: Path, desc_percentiles: Tuple[float, float],
+                   claim_percentiles: Tuple[float, float]) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    """Description and claim1 length cutoffs from a pre-pass over the input's lengths."""
+    desc_lengths, claim_lengths = read_lengths(input_path)
+    if not len(desc_lengths):
+        return (0, 0), (0, 0)
+    desc_range = tuple(np.percentile(desc_lengths, desc_percentiles))
+    claim_range = tuple(np.percentile(claim_lengths, claim_percentiles))
+    return desc_range, claim_range
+
+
+def build_stages(names: List[str], input_path: Path, desc_percentiles, claim_percentiles, para_min: int,
+                 para_max: int, paragraph_blacklist: Path, sentence_blacklist: Path) -> List[Stage]:
+    """Instantiate the named stages in pipeline order."""
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        typer.echo(f"Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})", err=True)
+        raise typer.Exit(1)
+
+    stages = []
+    for name in STAGES:
+        if name not in names:
+            continue
+        if name == "tail":
+            desc_range, claim_range = length_cutoffs(input_path, desc_percentiles, claim_percentiles)
+            typer.echo(f"Description length cutoffs: {desc_range[0]:.0f}-{desc_range[1]:.0f}")
+            typer.echo(f"Claim1 length cutoffs: {claim_range[0]:.0f}-{claim_range[1]:.0f}")
+            stages.append(TailCut(desc_range, claim_range))
+        elif name == "dedup":
+            stages.append(ExactDedup())
+        elif name == "para":
+            stages.append(ParagraphClean(para_min, para_max))
+        elif name == "para-bp":
+            stages.append(ParagraphBoilerplate(BoilerplateMatcher.from_files(paragraph_path=paragraph_blacklist)))
+        elif name == "sent-bp":
+            stages.append(SentenceBoilerplate(BoilerplateMatcher.from_files(sentence_path=sentence_blacklist)))
+    return stages
+
+
+def chain(records: Iterable[Dict], stages: List[Stage], save_after: List[str], output: Path) -> Iterator[Dict]:
+    """Connect the stage generators, teeing the output of stages named in save_after."""
+    for stage in stages:
+        records = stage.run(records)
+        if stage.name in save_after:
+            records = tee_records(records, output.with_name(f"{output.stem}.{stage.name}.jsonl"))
+    return records
+
+
+def report(stages: List[Stage], total_seconds: float):
+    """Print records in/out, drops and time per stage."""
+    typer.echo("=" * 72)
+    typer.echo(f"{'stage':<10}{'in':>12}{'out':>12}{'dropped':>12}{'seconds':>10}{'docs/sec':>14}")
+    for stage in stages:
+        rate = stage.records_in / stage.seconds if stage.seconds else 0.0
+        typer.echo(f"{stage.name:<10}{stage.records_in:>12,}{stage.records_out:>12,}"
+                   f"{stage.records_in - stage.records_out:>12,}{stage.seconds:>10.2f}{rate:>14,.0f}")
+        for counter, value in stage.counters.items():
+            typer.echo(f"{'':<10}{counter}: {value:,}")
+    typer.echo(f"Total time (including reading and writing): {total_seconds:.2f} seconds")
+    typer.echo("=" * 72)
+
+
+StagesOption = Annotated[str, typer.Option("--stages", help=f"Comma-separated stages to run ({','.join(STAGES)})")]
+DescPercentiles = Annotated[Tuple[float, float], typer.Option("--desc-percentiles",
+                                                              help="Description length percentiles to keep")]
+ClaimPercentiles = Annotated[Tuple[float, float], typer.Option("--claim-percentiles",
+                                                               help="Claim1 length percentiles to keep")]
+ParaMin = Annotated[int, typer.Option("--para-min", help="Minimum paragraph length (characters)")]
+ParaMax = Annotated[int, typer.Option("--para-max", help="Maximum paragraph length (characters)")]
+
+
+@app.command()
+def run(
+    input_file: Annotated[str, typer.Option("--input", help="Coarse-cleaned JSONL or Parquet file")] = "coarse_cleaned_patents.jsonl",
+    output: Annotated[str, typer.Option("--output", help="Output JSONL file")] = "cleaned_patents.jsonl",
+    stages: StagesOption = ",".join(STAGES),
+    desc_percentiles: DescPercentiles = (2.0, 90.0),
+    claim_percentiles: ClaimPercentiles = (2.0, 90.0),
+    para_min: ParaMin = 40,
+    para_max: ParaMax = 10240,
+    paragraph_blacklist: Annotated[str, typer.Option("--paragraph-blacklist", help="Paragraph blacklist JSONL")] = "boilerplate_blacklist.jsonl",
+    sentence_blacklist: Annotated[str, typer.Option("--sentence-blacklist", help="Sentence blacklist JSONL")] = "sentence_blacklist.jsonl",
+    save_after: Annotated[Optional[List[str]], typer.Option("--save-after", help="Also write the output of this stage (repeatable)")] = None,
+):
+    """
+    Run the selected stages over the input in a single streaming pass.
+    """
+    input_path = Path(input_file)
+    output_path = Path(output)
+    save_after = save_after or []
+    start = time.perf_counter()
+
+    pipeline = build_stages([name.strip() for name in stages.split(",") if name.strip()], input_path,
+                            desc_percentiles, claim_percentiles, para_min, para_max,
+                            Path(paragraph_blacklist), Path(sentence_blacklist))
+    records = chain(tqdm(read_records(input_path), desc="Cleaning"), pipeline, save_after, output_path)
+    written = write_records(records, output_path)
+
+    typer.echo(f"Saved {written:,} records to {output_path}")
+    report(pipeline, time.perf_counter() - start)
+
+
+@app.command("mine-paragraphs")
+def mine_paragraphs(
+    input_file: Annotated[str, typer.Option("--input", help="Coarse-cleaned JSONL or Parquet file")] = "coarse_cleaned_patents.jsonl",
+    output: Annotated[str, typer.Option("--output", help="Paragraph blacklist JSONL")] = "boilerplate_blacklist.jsonl",
+    freq_threshold: Annotated[int, typer.Option("--freq-threshold", help="Minimum total occurrences")] = 10,
+    stages: Annotated[str, typer.Option("--stages", help="Stages to apply before counting")] = "tail,dedup,para",
+    desc_percentiles: DescPercentiles = (2.0, 90.0),
+    claim_percentiles: ClaimPercentiles = (2.0, 90.0),
+    para_min: ParaMin = 40,
+    para_max: ParaMax = 10240,
+    work_dir: Annotated[Optional[str], typer.Option("--work-dir", help="Directory for the hash shards (default: <output>.work)")] = None,
+):
+    """
+    Count paragraphs (total and per document) and write those seen at least --freq-threshold times.
+
+    Counting is done on 64-bit paragraph hashes spilled to sharded files, so memory
+    does not grow with the number of distinct paragraphs; a second pass over the
+    input then collects the text of the frequent ones.
+    """
+    input_path = Path(input_file)
+    output_path = Path(output)
+    start = time.perf_counter()
+    names = [name.strip() for name in stages.split(",") if name.strip()]
+    if "para-bp" in names or "sent-bp" in names:
+        typer.echo("Blacklists are mined before the boilerplate stages; use --stages tail,dedup,para", err=True)
+        raise typer.Exit(1)
+    pipeline = build_stages(names, input_path, desc_percentiles, claim_percentiles, para_min, para_max,
+                            Path(), Path())
+
+    work_path = Path(work_dir) if work_dir else output_path.with_name(output_path.name + ".work")
+    shutil.rmtree(work_path, ignore_errors=True)
+    try:
+        # Pass 1: exact counts of paragraph hashes, on disk
+        counter = ParagraphCounter(work_path)
+        for rec in chain(tqdm(read_records(input_path), desc="Counting paragraphs"), pipeline, [], output_path):
+            counter.add_document(paragraphs_of(rec["description"]))
+        counts = counter.heavy_hitters(freq_threshold)
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    # Pass 2: text of the frequent paragraphs only, in order of first occurrence
+    texts = {}
+    if counts:
+        for stage in pipeline:
+            stage.reset()
+        for rec in chain(tqdm(read_records(input_path), desc="Collecting frequent paragraphs"), pipeline, [],
+                         output_path):
+            for p in paragraphs_of(rec["description"]):
+                h = paragraph_hash(p)
+                if h in counts and h not in texts:
+                    texts[h] = p
+
+    written = 0
+    with open(output_path, "w", encoding="utf-8") as fout:
+        # Stable sort: ties stay in order of first occurrence, as with Counter.most_common
+        for h in sorted(texts, key=lambda h: counts[h][0], reverse=True):
+            total_count, doc_count = counts[h]
+            fout.write(json.dumps({"text": texts[h], "total_count": total_count, "doc_count": doc_count},
+                                  ensure_ascii=False) + "\n")
+            written += 1
+
+    typer.echo(f"Saved {written:,} paragraphs seen at least {freq_threshold} times to {output_path}")
+    report(pipeline, time.perf_counter() - start)
+
+
+@app.command("seed-sentences")
+def seed_sentences(
+    input_file: Annotated[str, typer.Option("--input", help="Paragraph blacklist JSONL")] = "boilerplate_blacklist.jsonl",
+    output: Annotated[str, typer.Option("--output", help="Sentence blacklist JSONL")] = "sentence_blacklist.jsonl",
+    min_len: Annotated[int, typer.Option("--min-len", help="Minimum sentence length (characters)")] = 20,
+):
+    """
+    Split a paragraph blacklist into a sentence blacklist, dropping very short sentences.
+    """
+    sentences = set()
+    for text in load_blacklist(Path(input_file)):
+        sentences.update(split_sentences(text))
+    sentences = sorted(s for s in sentences if len(s) >= min_len)
+
+    with open(output, "w", encoding="utf-8") as fout:
+        for s in sentences:
+            # Seeded from paragraphs that have already been removed, so there are no counts
+            fout.write(json.dumps({"text": s, "total_count": 0, "doc_count": 0}, ensure_ascii=False) + "\n")
+    typer.echo(f"Saved {len(sentences):,} sentences to {output}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+cleaned_table.py
+
+Columnar (Parquet) storage for cleaned patent records, written by
+`2-coarse_cleaning.py --format parquet` and readable column by column, so later
+stages (length filtering, dedup, statistics) don't have to decode every JSON line.
+
+Columns:
+    pn                      string      publication number, e.g. EP1234567B1
+    filename                string      source path relative to the cleaner's input folder
+    date                    string      publication date (YYYYMMDD)
+    description             string      cleaned description, paragraphs separated by "\n\n"
+    claim1                  string      cleaned first claim
+    description_chars       int32       len(description)
+    description_paragraphs  int32       number of "\n\n"-separated paragraphs
+    claim1_chars            int32       len(claim1)
+    description_hash        binary(16)  blake2b-128 of the UTF-8 description
+    claim1_hash             binary(16)  blake2b-128 of the UTF-8 claim1
+
+Rows are written in row groups of `row_group_size` records (zstd-compressed), so
+readers can stream a large file group by group, and reading only the numeric or
+hash columns never touches the text. Requires pyarrow (the "parquet" extra:
+`uv sync --extra parquet`), which is imported lazily so the JSONL path of the
+cleaner works without it.
+
+Reader API:
+    read_columns(path, columns)          -> pyarrow.Table, memory-mapped
+    iter_records(path, columns, batch)   -> dict per row, one record batch at a time
+"""
+
+import hashlib
+from typing import Dict, Iterator, List, Optional
+
+
+# In the key order of the cleaner's JSONL records, so rows read back as identical dicts
+TEXT_COLUMNS = ("pn", "filename", "date", "description", "claim1")
+
+
+def text_hash(text: str) -> bytes:
+    """The 16-byte digest stored in the *_hash columns."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def schema():
+    """Arrow schema of the cleaned-record table."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("pn", pa.string()),
+        ("filename", pa.string()),
+        ("date", pa.string()),
+        ("description", pa.string()),
+        ("claim1", pa.string()),
+        ("description_chars", pa.int32()),
+        ("description_paragraphs", pa.int32()),
+        ("claim1_chars", pa.int32()),
+        ("description_hash", pa.binary(16)),
+        ("claim1_hash", pa.binary(16)),
+    ])
+
+
+class CleanedTableWriter:
+    """Buffer cleaned records and write them to Parquet one row group at a time."""
+
+    def __init__(self, path: str, row_group_size: int = 10000, compression: str = "zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = schema()
+        self.row_group_size = row_group_size
+        self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+        self._columns: Dict[str, List] = {name: [] for name in self.schema.names}
+        self.rows = 0
+
+    def write(self, rec: Dict):
+        """Add one {"pn", "filename", "date", "description", "claim1"} record."""
+        columns = self._columns
+        for name in TEXT_COLUMNS:
+            columns[name].append(rec.get(name) or "")
+        description = rec.get("description") or ""
+        claim1 = rec.get("claim1") or ""
+        columns["description_chars"].append(len(description))
+        columns["description_paragraphs"].append(description.count("\n\n") + 1 if description else 0)
+        columns["claim1_chars"].append(len(claim1))
+        columns["description_hash"].append(text_hash(description))
+        columns["claim1_hash"].append(text_hash(claim1))
+        self.rows += 1
+        if len(columns["pn"]) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._columns["pn"]:
+            return
+        table = self._pa.Table.from_pydict(self._columns, schema=self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        """Write the last partial row group and the Parquet footer."""
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_columns(path: str, columns: Optional[List[str]] = None):
+    """Read selected columns of a cleaned table (all if None), memory-mapping the file."""
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def iter_records(path: str, columns: Optional[List[str]] = None, batch_size: int = 10000) -> Iterator[Dict]:
+    """Yield rows as dicts, decoding one record batch at a time."""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+jsonl_writer.py
+
+Buffered, crash-safe per-date JSONL output for `scraper_epo_pub_server.py scrape claims`.
+
+Workers hand finished lines to a single writer thread over a bounded queue. The
+thread keeps an open handle for each of the `max_open` most recently used dates and
+buffers lines in memory until `flush_bytes` are pending or `flush_interval` seconds
+have passed. A flush then writes each dirty date, fsyncs it and records the durable
+size in a checkpoint sidecar:
+
+    claims_data/YYYYMMDD.jsonl        the records
+    claims_data/YYYYMMDD.jsonl.ckpt   byte length of the durable, acknowledged prefix
+
+Only after the checkpoint is on disk does the writer run each record's `on_durable`
+callback, which the scraper uses to mark the document completed in SQLite. Opening
+a date beyond `max_open` first flushes, checkpoints and closes the least recently
+used one; the scraper works through pending documents in date order, so a handful
+of handles covers the dates in flight. When a date file is opened again, anything
+past its checkpoint (a torn or unacknowledged tail from a crash) is truncated away;
+those documents are still pending in the database and are simply fetched again.
+Files without a checkpoint, e.g. written before this module existed, are trimmed
+back to their last complete line.
+
+Delivery is at-least-once: a crash between the checkpoint and the SQLite commit of
+the status updates can leave a record in the file whose document is re-scraped.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+
+CHECKPOINT_SUFFIX = ".ckpt"
+
+
+def recover(path: Path, checkpoint_path: Path) -> int:
+    """Truncate a JSONL file to its durable prefix and return that prefix's length."""
+    size = path.stat().st_size if path.exists() else 0
+    durable = None
+    if checkpoint_path.exists():
+        try:
+            durable = int(checkpoint_path.read_text().strip())
+        except ValueError:
+            durable = None
+
+    if durable is None:
+        # No usable checkpoint: keep everything up to the last complete line
+        durable = _last_line_end(path, size)
+
+    if durable < size:
+        with open(path, "r+b") as f:
+            f.truncate(durable)
+    return min(durable, size)
+
+
+def _last_line_end(path: Path, size: int, chunk_size: int = 65536) -> int:
+    """Offset just past the last newline in the first `size` bytes of path (0 if none)."""
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(0, end - chunk_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+class _DateFile:
+    """Open handle, pending buffer and callbacks for one date's JSONL file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.checkpoint_path = path.with_name(path.name + CHECKPOINT_SUFFIX)
+        self.handle = open(path, "ab")
+        self.durable = recover(path, self.checkpoint_path)
+        self.handle.seek(self.durable)
+        self.buffer: List[bytes] = []
+        self.callbacks: List[Tuple[Optional[Callable[[], None]], Optional[Callable[[Exception], None]]]] = []
+
+
+class JSONLWriter:
+    """Single-threaded, buffered writer of per-date JSONL files with fsync checkpoints."""
+
+    def __init__(self, root: Union[str, Path], flush_bytes: int = 1 << 20, flush_interval: float = 1.0,
+                 max_queue: int = 10000, max_open: int = 8, on_flush: Optional[Callable[[float], None]] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_open = max_open
+        self.on_flush = on_flush
+        self.logger = logging.getLogger(__name__)
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Open date files, least recently used first
+        self._files: OrderedDict[str, _DateFile] = OrderedDict()
+        self._pending_bytes = 0
+        self._thread = threading.Thread(target=self._run, name="epo-jsonl-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, date: str, line: str, on_durable: Optional[Callable[[], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None):
+        """Queue one line (without trailing newline) for `date`; blocks while the queue is full.
+
+        `date` names the file stem under root and may include a subdirectory, e.g.
+        "clean/20240103" for the fused scrape mode.
+        """
+        self._queue.put(("line", date, (line, on_durable, on_error)))
+
+    def close(self):
+        """Flush everything queued so far, run its callbacks and close all files."""
+        self._queue.put(("stop", None, None))
+        self._thread.join()
+
+    def _run(self):
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, date, payload = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    kind, date, payload = "tick", None, None
+
+                if kind == "line":
+                    line, on_durable, on_error = payload
+                    try:
+                        date_file = self._open(date)
+                    except OSError as e:
+                        self.logger.error(f"Cannot open JSONL output for {date}: {e}")
+                        if on_error:
+                            on_error(e)
+                        continue
+                    data = (line + "\n").encode("utf-8")
+                    date_file.buffer.append(data)
+                    date_file.callbacks.append((on_durable, on_error))
+                    self._pending_bytes += len(data)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if self._pending_bytes < self.flush_bytes:
+                        continue
+
+                self._flush()
+                deadline = None
+
+                if kind == "stop":
+                    return
+        finally:
+            for date_file in self._files.values():
+                date_file.handle.close()
+            self._files = OrderedDict()
+
+    def _open(self, date: str) -> _DateFile:
+        date_file = self._files.get(date)
+        if date_file is not None:
+            self._files.move_to_end(date)
+            return date_file
+        while len(self._files) >= self.max_open:
+            self._evict()
+        path = self.root / f"{date}.jsonl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        date_file = _DateFile(path)
+        self._files[date] = date_file
+        return date_file
+
+    def _evict(self):
+        """Flush, checkpoint and close the least recently used date file."""
+        _, date_file = self._files.popitem(last=False)
+        self._pending_bytes -= sum(len(data) for data in date_file.buffer)
+        self._flush_file(date_file)
+        try:
+            date_file.handle.close()
+        except OSError as e:
+            self.logger.error(f"Failed to close {date_file.path}: {e}")
+
+    def _flush(self):
+        """Write, fsync and checkpoint every dirty date, then acknowledge its records."""
+        start = time.perf_counter()
+        for date_file in self._files.values():
+            self._flush_file(date_file)
+        self._pending_bytes = 0
+        if self.on_flush:
+            self.on_flush(time.perf_counter() - start)
+
+    def _flush_file(self, date_file: _DateFile):
+        """Write, fsync and checkpoint one date's buffered lines, then run their callbacks."""
+        if not date_file.buffer:
+            return
+        buffer, date_file.buffer = date_file.buffer, []
+        callbacks, date_file.callbacks = date_file.callbacks, []
+        try:
+            date_file.handle.write(b"".join(buffer))
+            date_file.handle.flush()
+            os.fsync(date_file.handle.fileno())
+            durable = date_file.handle.tell()
+            self._write_checkpoint(date_file.checkpoint_path, durable)
+        except OSError as e:
+            self.logger.error(f"Failed to write {date_file.path}: {e}")
+            self._rewind(date_file)
+            for _, on_error in callbacks:
+                if on_error:
+                    try:
+                        on_error(e)
+                    except Exception as callback_error:
+                        self.logger.error(f"Error callback failed for {date_file.path}: {callback_error}")
+            return
+        date_file.durable = durable
+        for on_durable, _ in callbacks:
+            if on_durable:
+                try:
+                    on_durable()
+                except Exception as e:
+                    self.logger.error(f"Durable-record callback failed for {date_file.path}: {e}")
+
+    @staticmethod
+    def _write_checkpoint(checkpoint_path: Path, durable: int):
+        tmp_path = checkpoint_path.with_name(checkpoint_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(str(durable))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path)
+
+    def _rewind(self, date_file: _DateFile):
+        """Drop a partially written flush so the file ends at its last checkpoint again."""
+        try:
+            date_file.handle.truncate(date_file.durable)
+            date_file.handle.seek(date_file.durable)
+        except OSError as e:
+            self.logger.error(f"Failed to roll back {date_file.path}: {e}")
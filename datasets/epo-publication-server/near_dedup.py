@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+near_dedup.py
+
+Corpus-wide near-duplicate detection with MinHash-LSH, for the cleaned EP records
+(JSONL or the Parquet table of 2-coarse_cleaning.py) and the US descriptions.
+
+The US descriptions notebook builds one datasketch MinHash per document from its
+word set, in a Python loop, and can only afford a 20k-row sample. Here:
+
+    shingles    lowercased whitespace-separated words are hashed with numpy over the
+                UTF-8 bytes of the whole text, then combined into hashes of
+                --shingle-size consecutive words (real n-gram shingles)
+    signatures  --num-perm multiply-shift hash functions, minimised over all
+                shingles at once; batches of documents are signed in a process pool
+    LSH         each signature is cut into bands of rows; every band's
+                (bucket key, document) pairs are appended to a file in the work
+                directory instead of an in-memory index, as are the signatures
+    clusters    each band file is sorted on its own; within a bucket every document
+                is paired with the bucket's first document and with the one before
+                it, and pairs whose estimated Jaccard similarity reaches
+                --threshold are merged with union-find
+
+Memory is bounded by one band file (16 bytes per document) plus that band's
+candidate pairs, which are verified and merged before the next band is read, and
+the cluster map; the signatures (4 bytes x --num-perm per document) stay on disk
+and are memory-mapped for verification. Documents without any shingle are never
+clustered.
+
+Buckets are not expanded into all their pairs, which is quadratic in the bucket size
+for boilerplate-heavy texts. Two near-duplicates B and D in a bucket [A, B, C, D]
+are still missed when A and C are dissimilar to both and no other band or chain
+of verified pairs links them; each of the other bands gives them another chance.
+
+A cluster is a connected component of verified pairs, so members are similar to
+some other member, not necessarily to all of them. The first document of each
+cluster in input order is its representative. Output:
+
+    --output         one {"representative", "duplicates"} line per cluster, with
+                     document ids from --id-field (the record index if missing)
+    --dedup-output   optional copy of the input without the non-representative
+                     members (JSONL)
+
+--bands and --rows default to the split of --num-perm that minimises the
+equally weighted false positive and false negative probability at --threshold,
+as datasketch does.
+
+Examples:
+    python near_dedup.py --input cleaned_patents.jsonl --output near_dups.jsonl --workers 8
+    python near_dedup.py --input us_descriptions/year=2025 --text-field description_text \\
+        --id-field patent_id --output us_near_dups.jsonl --dedup-output us_dedup.jsonl
+"""
+
+import json
+import shutil
+import time
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import typer
+from typing_extensions import Annotated
+from tqdm import tqdm
+
+
+app = typer.Typer(help="Find near-duplicate documents with MinHash-LSH")
+
+MAX_HASH = np.uint64(0xFFFFFFFF)
+BAND_DTYPE = np.dtype([("key", "<u8"), ("doc", "<i8")])
+
+# Bytes that separate words, as str.split() does for ASCII whitespace
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[9, 10, 11, 12, 13, 32]] = True
+
+_BYTE_MULT = np.uint64(0x100000001B3)
+_SHINGLE_MULT = np.uint64(0x9E3779B97F4A7C15)
+
+
+# ---------- Hashing ----------
+def mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser, so that nearby inputs get unrelated hashes."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def word_hashes(text: str) -> np.ndarray:
+    """64-bit hash of every lowercased whitespace-separated word, in order."""
+    data = np.frombuffer(text.lower().encode("utf-8"), dtype=np.uint8)
+    is_word = ~_WHITESPACE[data]
+    edges = np.diff(np.concatenate(([False], is_word, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    if not len(starts):
+        return np.empty(0, dtype=np.uint64)
+    lengths = np.flatnonzero(edges == -1) - starts
+
+    # Polynomial hash of each word: sum of byte * MULT**position within the word
+    positions = np.flatnonzero(is_word)
+    offsets = positions - np.repeat(starts, lengths)
+    powers = np.ones(int(lengths.max()), dtype=np.uint64)
+    powers[1:] = np.cumprod(np.full(len(powers) - 1, _BYTE_MULT, dtype=np.uint64))
+    terms = (data[positions].astype(np.uint64) + np.uint64(1)) * powers[offsets]
+    sums = np.add.reduceat(terms, np.concatenate(([0], np.cumsum(lengths)[:-1])))
+    return mix64(sums ^ lengths.astype(np.uint64))
+
+
+def shingle_hashes(words: np.ndarray, shingle_size: int) -> np.ndarray:
+    """Distinct hashes of every run of shingle_size consecutive words (one run for shorter texts)."""
+    if not len(words):
+        return words
+    size = min(shingle_size, len(words))
+    count = len(words) - size + 1
+    hashes = words[:count].copy()
+    for j in range(1, size):
+        hashes = hashes * _SHINGLE_MULT + words[j:j + count]
+    return np.unique(mix64(hashes))
+
+
+def permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Odd multipliers and offsets of the multiply-shift hash functions."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash(shingles: np.ndarray, a: np.ndarray, b: np.ndarray, block: int = 2048) -> np.ndarray:
+    """MinHash signature (uint32 per permutation): min over shingles of the top 32 bits of a*x+b."""
+    signature = np.full(len(a), MAX_HASH, dtype=np.uint64)
+    for i in range(0, len(shingles), block):
+        chunk = shingles[i:i + block]
+        values = (np.multiply.outer(a, chunk) + b[:, None]) >> np.uint64(32)
+        np.minimum(signature, values.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+# ---------- Worker ----------
+_params = None
+
+
+def init_worker(num_perm: int, shingle_size: int, seed: int):
+    """Set up the hash functions once per process."""
+    global _params
+    _params = (shingle_size, *permutations(num_perm, seed))
+
+
+def sign_batch(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Signatures (len(texts) x num_perm) and a mask of the texts that had any shingle."""
+    shingle_size, a, b = _params
+    signatures = np.empty((len(texts), len(a)), dtype=np.uint32)
+    valid = np.zeros(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        shingles = shingle_hashes(word_hashes(text or ""), shingle_size)
+        valid[i] = len(shingles) > 0
+        signatures[i] = minhash(shingles, a, b)
+    return signatures, valid
+
+
+# ---------- LSH ----------
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) minimising false positive + false negative probability at threshold."""
+    best, best_error = (1, num_perm), float("inf")
+    s_low = np.linspace(0.0, threshold, 200)
+    s_high = np.linspace(threshold, 1.0, 200)
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_positive = np.trapezoid(1 - (1 - s_low ** rows) ** bands, s_low)
+        false_negative = np.trapezoid((1 - s_high ** rows) ** bands, s_high)
+        if false_positive + false_negative < best_error:
+            best, best_error = (bands, rows), false_positive + false_negative
+    return best
+
+
+def band_keys(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """64-bit bucket key of every band of every signature (n x bands)."""
+    values = signatures[:, :bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    weights = mix64(np.arange(1, rows + 1, dtype=np.uint64))
+    return mix64((values * weights).sum(axis=2, dtype=np.uint64))
+
+
+def band_candidates(path: Path) -> np.ndarray:
+    """(lower, higher) document pairs of each bucket of one band file.
+
+    Every document after the first is paired with the bucket's first document and with
+    its predecessor, so a bucket of k documents gives at most 2k - 3 pairs.
+    """
+    entries = np.fromfile(path, dtype=BAND_DTYPE)
+    if len(entries) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    # Documents were appended in input order, so a stable sort keeps each bucket ascending
+    order = np.argsort(entries["key"], kind="stable")
+    keys = entries["key"][order]
+    docs = entries["doc"][order]
+    run_start = np.concatenate(([True], keys[1:] != keys[:-1]))
+    heads = docs[np.maximum.accumulate(np.where(run_start, np.arange(len(keys)), 0))]
+    members = np.flatnonzero(~run_start)
+    head_pairs = np.stack([heads[members], docs[members]], axis=1)
+    # Members whose predecessor is not the head are also paired with that predecessor
+    later = members[~run_start[members - 1]]
+    neighbour_pairs = np.stack([docs[later - 1], docs[later]], axis=1)
+    return np.concatenate([head_pairs, neighbour_pairs])
+
+
+def verify(pairs: np.ndarray, signatures: np.ndarray, threshold: float, block: int = 65536) -> np.ndarray:
+    """Pairs whose signatures agree on at least threshold of the permutations."""
+    kept = []
+    for i in range(0, len(pairs), block):
+        chunk = pairs[i:i + block]
+        similarity = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+        kept.append(chunk[similarity >= threshold])
+    return np.concatenate(kept) if kept else np.empty((0, 2), dtype=np.int64)
+
+
+def find_root(parent: Dict[int, int], x: int) -> int:
+    """Cluster root of x in a union-find parent map, compressing the path to it."""
+    root = x
+    while parent.get(root, root) != root:
+        root = parent[root]
+    while parent.get(x, x) != root:
+        parent[x], x = root, parent[x]
+    return root
+
+
+def union_pairs(parent: Dict[int, int], pairs: np.ndarray):
+    """Merge the clusters of each pair into the parent map, keeping the lowest index as root."""
+    for a, b in pairs.tolist():
+        root_a, root_b = find_root(parent, a), find_root(parent, b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+            parent.setdefault(min(root_a, root_b), min(root_a, root_b))
+
+
+def clusters_from_pairs(pairs: np.ndarray) -> Dict[int, int]:
+    """Union-find over pairs: each clustered document mapped to its cluster's lowest index."""
+    parent: Dict[int, int] = {}
+    union_pairs(parent, pairs)
+    return {doc: find_root(parent, doc) for doc in list(parent)}
+
+
+# ---------- Input ----------
+def read_records(path: Path, columns: List[str]) -> Iterator[Dict]:
+    """Yield records from JSONL, or the given columns of a Parquet file or directory of Parquet parts."""
+    if path.is_dir() or path.suffix == ".parquet":
+        from cleaned_table import iter_records
+
+        for part in sorted(path.rglob("*.parquet")) if path.is_dir() else [path]:
+            yield from iter_records(str(part), columns)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def text_batches(path: Path, text_field: str, batch_size: int) -> Iterator[List[str]]:
+    batch = []
+    for rec in read_records(path, [text_field]):
+        batch.append(rec.get(text_field) or "")
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def signed_batches(batches: Iterator[List[str]], workers: int, init_args: Tuple) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Sign batches in order, with at most 2 x workers batches in flight."""
+    if workers == 1:
+        init_worker(*init_args)
+        for batch in batches:
+            yield sign_batch(batch)
+        return
+    with Pool(workers, initializer=init_worker, initargs=init_args) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(sign_batch, (batch,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+@app.command()
+def main(
+    input_file: Annotated[str, typer.Option("--input", help="JSONL, Parquet file or directory of Parquet parts")] = "cleaned_patents.jsonl",
+    output: Annotated[str, typer.Option("--output", help="Cluster JSONL")] = "near_duplicates.jsonl",
+    dedup_output: Annotated[Optional[str], typer.Option("--dedup-output", help="Also write the input without near-duplicates (JSONL)")] = None,
+    text_field: Annotated[str, typer.Option("--text-field", help="Field holding the text")] = "description",
+    id_field: Annotated[str, typer.Option("--id-field", help="Field identifying a document in the output")] = "pn",
+    threshold: Annotated[float, typer.Option("--threshold", help="Estimated Jaccard similarity of near-duplicates")] = 0.85,
+    num_perm: Annotated[int, typer.Option("--num-perm", help="MinHash permutations")] = 128,
+    shingle_size: Annotated[int, typer.Option("--shingle-size", help="Words per shingle")] = 5,
+    bands: Annotated[int, typer.Option("--bands", help="LSH bands (0: choose from --threshold)")] = 0,
+    rows: Annotated[int, typer.Option("--rows", help="Rows per band (0: choose from --threshold)")] = 0,
+    workers: Annotated[int, typer.Option("--workers", help="Signing processes")] = 1,
+    batch_size: Annotated[int, typer.Option("--batch-size", help="Documents per signing task")] = 1000,
+    seed: Annotated[int, typer.Option("--seed", help="Seed of the hash functions")] = 1,
+    work_dir: Annotated[Optional[str], typer.Option("--work-dir", help="Directory for signatures and band files (default: <output>.work)")] = None,
+    keep_work: Annotated[bool, typer.Option("--keep-work", help="Keep the work directory afterwards")] = False,
+):
+    """
+    Sign every document, bucket the signatures by band on disk and write the near-duplicate clusters.
+    """
+    input_path = Path(input_file)
+    output_path = Path(output)
+    work_path = Path(work_dir) if work_dir else output_path.with_name(output_path.name + ".work")
+    if not (bands and rows):
+        bands, rows = optimal_bands(threshold, num_perm)
+    if bands * rows > num_perm:
+        typer.echo(f"--bands x --rows ({bands} x {rows}) exceeds --num-perm ({num_perm})", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"{num_perm} permutations, {bands} bands of {rows} rows, threshold {threshold}")
+
+    shutil.rmtree(work_path, ignore_errors=True)
+    work_path.mkdir(parents=True)
+    signature_path = work_path / "signatures.u32"
+    band_paths = [work_path / f"band-{i:03d}.bin" for i in range(bands)]
+    start = time.perf_counter()
+
+    # Pass 1: signatures and band buckets
+    total = 0
+    band_files = [open(path, "wb") for path in band_paths]
+    try:
+        with open(signature_path, "wb") as signature_file, tqdm(desc="Signing", unit="docs") as progress:
+            init_args = (num_perm, shingle_size, seed)
+            for signatures, valid in signed_batches(text_batches(input_path, text_field, batch_size), workers, init_args):
+                signature_file.write(signatures.tobytes())
+                docs = np.flatnonzero(valid) + total
+                keys = band_keys(signatures[valid], bands, rows)
+                for band, band_file in enumerate(band_files):
+                    entries = np.empty(len(docs), dtype=BAND_DTYPE)
+                    entries["key"] = keys[:, band]
+                    entries["doc"] = docs
+                    band_file.write(entries.tobytes())
+                total += len(signatures)
+                progress.update(len(signatures))
+    finally:
+        for band_file in band_files:
+            band_file.close()
+    sign_seconds = time.perf_counter() - start
+
+    # Pass 2: candidate pairs per band, verified against the signatures
+    signatures = np.memmap(signature_path, dtype=np.uint32, mode="r", shape=(total, num_perm)) if total else np.empty((0, num_perm), dtype=np.uint32)
+    # Each band is verified and merged before the next is read, so only one band's
+    # pairs are in memory; pairs found again in a later band are simply re-verified
+    parent: Dict[int, int] = {}
+    num_candidates = num_verified = 0
+    for path in tqdm(band_paths, desc="Verifying bands"):
+        candidates = np.unique(band_candidates(path), axis=0)
+        pairs = verify(candidates, signatures, threshold)
+        union_pairs(parent, pairs)
+        num_candidates += len(candidates)
+        num_verified += len(pairs)
+    clusters = {doc: find_root(parent, doc) for doc in list(parent)}
+    typer.echo(f"{num_candidates:,} candidate pairs, {num_verified:,} verified (summed over bands)")
+
+    # Pass 3: ids of the clustered documents, and the deduplicated copy
+    ids: Dict[int, str] = {}
+    dedup_file = open(dedup_output, "w", encoding="utf-8") if dedup_output else None
+    kept = 0
+    try:
+        records = read_records(input_path, None if dedup_file else [id_field])
+        for index, rec in enumerate(tqdm(records, total=total, desc="Writing")):
+            root = clusters.get(index)
+            if root is not None:
+                ids[index] = rec.get(id_field, index)
+            if dedup_file and (root is None or root == index):
+                dedup_file.write(json.dumps(rec, ensure_ascii=False, default=bytes.hex) + "\n")
+                kept += 1
+    finally:
+        if dedup_file:
+            dedup_file.close()
+
+    members: Dict[int, List[int]] = {}
+    for doc, root in sorted(clusters.items()):
+        if doc != root:
+            members.setdefault(root, []).append(doc)
+    with open(output_path, "w", encoding="utf-8") as fout:
+        for root in sorted(members):
+            fout.write(json.dumps({"representative": ids[root], "duplicates": [ids[doc] for doc in members[root]]},
+                                  ensure_ascii=False) + "\n")
+
+    if not keep_work:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    duplicates = sum(len(docs) for docs in members.values())
+    typer.echo("=" * 72)
+    typer.echo(f"Documents: {total:,}")
+    typer.echo(f"Clusters: {len(members):,} ({duplicates:,} near-duplicates) saved to {output_path}")
+    if dedup_output:
+        typer.echo(f"Kept {kept:,} documents in {dedup_output}")
+    typer.echo(f"Signing: {sign_seconds:.2f} seconds ({total / sign_seconds if sign_seconds else 0:,.0f} docs/sec)")
+    typer.echo(f"Total time: {time.perf_counter() - start:.2f} seconds")
+    typer.echo("=" * 72)
+
+
+if __name__ == "__main__":
+    app()
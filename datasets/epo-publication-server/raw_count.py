@@ -11,7 +11,8 @@ Usage:
 
 Arguments:
     --xml-dir    : str, optional (default: ./xml)
-        Directory containing XML files and subdirectories to process
+        Directory containing XML files and subdirectories to process. Compressed
+        shards written by `scrape xml --storage shards` are read in place.
     --workers    : int, optional (default: -1, uses all CPU cores)
         Number of parallel workers for processing
     --verbose    : bool, optional (default: False)
@@ -32,6 +33,8 @@ import logging
 from joblib import Parallel, delayed
 from tqdm import tqdm
 
+from xml_store import XMLSource, find_xml_sources, read_source_text, source_name
+
 
 def setup_logging(verbose: bool = False) -> None:
     """Setup logging configuration."""
@@ -43,51 +46,43 @@ def setup_logging(verbose: bool = False) -> None:
     )
 
 
-def find_xml_files(xml_dir: Path) -> List[Path]:
+def find_xml_files(xml_dir: Path) -> List[XMLSource]:
     """
-    Recursively find all XML files in the given directory.
+    Recursively find all XML documents in the given directory.
     
     Args:
         xml_dir: Path to the XML directory
         
     Returns:
-        List of Path objects for all XML files found
+        Sorted Path objects for plain XML files, followed by ShardRefs for
+        documents stored in compressed shards
     """
-    xml_files = []
-    
     if not xml_dir.exists():
         raise FileNotFoundError(f"XML directory not found: {xml_dir}")
     
-    # Recursively find all .xml files
-    for xml_file in xml_dir.rglob("*.xml"):
-        if xml_file.is_file():
-            xml_files.append(xml_file)
-    
-    return sorted(xml_files)
+    return find_xml_sources(xml_dir)
 
 
-def count_file_characters(xml_file: Path) -> Tuple[str, int, bool]:
+def count_file_characters(xml_file: XMLSource) -> Tuple[str, int, bool]:
     """
-    Count characters in a single XML file.
+    Count characters in a single XML document.
     
     Args:
-        xml_file: Path to the XML file
+        xml_file: Path to the XML file, or ShardRef of a sharded document
         
     Returns:
         Tuple of (filename, character_count, success_flag)
     """
     try:
-        with open(xml_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            char_count = len(content)
-        return (str(xml_file), char_count, True)
+        char_count = len(read_source_text(xml_file))
+        return (source_name(xml_file), char_count, True)
     
     except Exception as e:
-        logging.error(f"Error processing {xml_file}: {e}")
-        return (str(xml_file), 0, False)
+        logging.error(f"Error processing {source_name(xml_file)}: {e}")
+        return (source_name(xml_file), 0, False)
 
 
-def process_xml_files(xml_files: List[Path], n_jobs: int = -1, verbose: bool = False) -> Dict[str, int]:
+def process_xml_files(xml_files: List[XMLSource], n_jobs: int = -1, verbose: bool = False) -> Dict[str, int]:
     """
     Process XML files in parallel to count characters.
     
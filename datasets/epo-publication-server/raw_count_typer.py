@@ -25,25 +25,30 @@ from joblib import Parallel, delayed
 from tqdm import tqdm
 from lxml import etree
 
+from xml_store import ShardRef, XMLSource, find_xml_sources, read_ref_prefix, read_source_text, source_name
+
 
 app = typer.Typer(help="Count characters in patent XML files using parallel processing")
 
 
-def extract_patent_id(xml_file: Path) -> Optional[str]:
+def extract_patent_id(xml_file: XMLSource) -> Optional[str]:
     """
     Extract the patent ID from the ep-patent-document root element.
     
     Args:
-        xml_file: Path to the XML file
+        xml_file: Path to the XML file, or ShardRef of a sharded document
         
     Returns:
         Patent ID string or None if not found
     """
     try:
         # Parse just enough of the XML to get the root element attributes
-        with open(xml_file, 'rb') as f:
-            # Read first few lines to find the ep-patent-document tag
-            content = f.read(2048)  # Should be enough for the root tag
+        if isinstance(xml_file, ShardRef):
+            content = read_ref_prefix(xml_file, 2048)
+        else:
+            with open(xml_file, 'rb') as f:
+                # Read first few lines to find the ep-patent-document tag
+                content = f.read(2048)  # Should be enough for the root tag
             
         # Use regex to extract the id attribute from ep-patent-document tag
         pattern = r'<ep-patent-document[^>]+id="([^"]+)"'
@@ -52,20 +57,20 @@ def extract_patent_id(xml_file: Path) -> Optional[str]:
         if match:
             return match.group(1)
         else:
-            typer.echo(f"Warning: No patent ID found in {xml_file}", err=True)
+            typer.echo(f"Warning: No patent ID found in {source_name(xml_file)}", err=True)
             return None
             
     except Exception as e:
-        typer.echo(f"Error extracting patent ID from {xml_file}: {e}", err=True)
+        typer.echo(f"Error extracting patent ID from {source_name(xml_file)}: {e}", err=True)
         return None
 
 
-def count_file_characters(xml_file: Path) -> Tuple[Optional[str], str, int, bool]:
+def count_file_characters(xml_file: XMLSource) -> Tuple[Optional[str], str, int, bool]:
     """
-    Count characters in a single XML file and extract patent ID.
+    Count characters in a single XML document and extract patent ID.
     
     Args:
-        xml_file: Path to the XML file
+        xml_file: Path to the XML file, or ShardRef of a sharded document
         
     Returns:
         Tuple of (patent_id, filename, character_count, success_flag)
@@ -75,38 +80,31 @@ def count_file_characters(xml_file: Path) -> Tuple[Optional[str], str, int, bool
         patent_id = extract_patent_id(xml_file)
         
         # Count characters
-        with open(xml_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            char_count = len(content)
+        char_count = len(read_source_text(xml_file))
         
-        return (patent_id, str(xml_file), char_count, True)
+        return (patent_id, source_name(xml_file), char_count, True)
     
     except Exception as e:
-        typer.echo(f"Error processing {xml_file}: {e}", err=True)
-        return (None, str(xml_file), 0, False)
+        typer.echo(f"Error processing {source_name(xml_file)}: {e}", err=True)
+        return (None, source_name(xml_file), 0, False)
 
 
-def find_xml_files(xml_dir: Path) -> List[Path]:
+def find_xml_files(xml_dir: Path) -> List[XMLSource]:
     """
-    Recursively find all XML files in the given directory.
+    Recursively find all XML documents in the given directory.
     
     Args:
         xml_dir: Path to the XML directory
         
     Returns:
-        List of Path objects for all XML files found
+        Sorted Path objects for plain XML files, followed by ShardRefs for
+        documents stored in compressed shards (`scrape xml --storage shards`)
     """
     if not xml_dir.exists():
         typer.echo(f"Error: XML directory not found: {xml_dir}", err=True)
         raise typer.Exit(1)
     
-    # Recursively find all .xml files
-    xml_files = []
-    for xml_file in xml_dir.rglob("*.xml"):
-        if xml_file.is_file():
-            xml_files.append(xml_file)
-    
-    return sorted(xml_files)
+    return find_xml_sources(xml_dir)
 
 
 def save_results_to_csv(results: List[Tuple], output_file: Path) -> None:
@@ -126,7 +124,7 @@ def save_results_to_csv(results: List[Tuple], output_file: Path) -> None:
 
 
 def process_xml_files(
-    xml_files: List[Path], 
+    xml_files: List[XMLSource], 
     n_jobs: int = -1, 
     verbose: bool = False,
     output_file: Optional[Path] = None
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+scrape_metrics.py
+
+Live throughput and latency metrics for scraper_epo_pub_server.py.
+
+The scraper records how long every document spends in each stage and how many
+bytes it downloaded:
+    connect   DNS + TCP/TLS setup for new connections
+    request   time to response headers (includes connect on a new connection)
+    download  time to read the response body after the headers
+    parse     claims extraction
+    write     JSONL / XML output (for claims and XML shards: handing the record to its writer)
+    flush     one buffered flush + fsync of the claims writer (with its checkpoint) or
+              of the XML shard writer
+    db        one batched status-update commit of the SQLite writer thread
+
+ScrapeMetrics keeps running totals plus a sliding window of recent samples per
+stage, from which it reports p50/p95/p99, and documents/sec both overall and over
+the last flush interval. A snapshot is written as JSON every `interval` seconds
+(atomically, via a temporary file), and can also be served in the Prometheus text
+format on a local port:
+
+    curl http://127.0.0.1:9108/metrics
+
+Usage (from the scraper):
+    python scraper_epo_pub_server.py scrape claims --output-dir claims_data \
+        --metrics-file metrics.json --metrics-port 9108
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+
+STAGES = ("connect", "request", "download", "parse", "write", "flush", "db")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class ScrapeMetrics:
+    """Thread-safe stage timers, byte and document counters with periodic export."""
+
+    def __init__(self, path: Optional[str] = None, interval: float = 10.0, port: Optional[int] = None,
+                 window: int = 10000):
+        self.path = path
+        self.interval = interval
+        self.port = port
+        self.window = window
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self._totals = {stage: [0, 0.0] for stage in STAGES}
+        self._counters: Dict[str, int] = {"docs": 0, "saved": 0, "bytes": 0}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._last_rate = (time.monotonic(), 0)
+        self._recent_docs_per_sec = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for a stage."""
+        with self._lock:
+            self._samples[stage].append(seconds)
+            total = self._totals[stage]
+            total[0] += 1
+            total[1] += seconds
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time the body of a with-block as one sample of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name: str, value: int = 1):
+        """Increment a counter ('docs', 'saved', 'bytes', ...)."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, fn: Callable[[], float]):
+        """Register a value read at snapshot time, e.g. the current rate limit."""
+        self._gauges[name] = fn
+
+    def snapshot(self) -> Dict:
+        """Current totals, rates and per-stage latency percentiles; reading it changes nothing."""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            totals = {stage: tuple(total) for stage, total in self._totals.items()}
+            counters = dict(self._counters)
+            recent = self._recent_docs_per_sec
+
+        elapsed = max(time.time() - self._started, 1e-9)
+        stages = {}
+        for stage in STAGES:
+            count, total = totals[stage]
+            if not count:
+                continue
+            values = samples[stage]
+            stages[stage] = {
+                "count": count,
+                "total_s": round(total, 6),
+                "mean_s": round(total / count, 6),
+                **{f"p{int(q * 100)}_s": round(percentile(values, q), 6) for q in QUANTILES},
+            }
+
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "uptime_s": round(elapsed, 3),
+            "counters": counters,
+            "docs_per_sec": round(counters["docs"] / elapsed, 3),
+            "docs_per_sec_recent": round(recent, 3),
+            "download_mb_per_sec": round(counters["bytes"] / elapsed / 1e6, 3),
+            "stages": stages,
+            "gauges": {name: fn() for name, fn in self._gauges.items()},
+        }
+
+    def summary(self) -> str:
+        """One log line with throughput and p50/p95/p99 per stage."""
+        snap = self.snapshot()
+        parts = [f"{snap['counters']['docs']} docs at {snap['docs_per_sec']:.1f} docs/sec, "
+                 f"{snap['download_mb_per_sec']:.2f} MB/s"]
+        for stage, values in snap["stages"].items():
+            parts.append(f"{stage} p50/p95/p99 {values['p50_s'] * 1000:.0f}/{values['p95_s'] * 1000:.0f}/"
+                         f"{values['p99_s'] * 1000:.0f} ms")
+        return "; ".join(parts)
+
+    def prometheus(self) -> str:
+        """Render a snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+        for name, value in snap["counters"].items():
+            lines.append(f"# TYPE epo_scraper_{name}_total counter")
+            lines.append(f"epo_scraper_{name}_total {value}")
+        lines += [
+            "# TYPE epo_scraper_docs_per_second gauge",
+            f"epo_scraper_docs_per_second {snap['docs_per_sec_recent']}",
+            "# TYPE epo_scraper_stage_seconds summary",
+        ]
+        for stage, values in snap["stages"].items():
+            for q in QUANTILES:
+                lines.append(f'epo_scraper_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                             f'{values[f"p{int(q * 100)}_s"]}')
+            lines.append(f'epo_scraper_stage_seconds_sum{{stage="{stage}"}} {values["total_s"]}')
+            lines.append(f'epo_scraper_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+        for name, value in snap["gauges"].items():
+            lines.append(f"# TYPE epo_scraper_{name} gauge")
+            lines.append(f"epo_scraper_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Write a snapshot to the metrics file, replacing it atomically."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def start(self):
+        """Start the flush loop (recent rate and JSON writer) and, if a port is set, the metrics endpoint."""
+        if self.path or self.port is not None:
+            self._thread = threading.Thread(target=self._flush_loop, name="epo-metrics", daemon=True)
+            self._thread.start()
+        if self.port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.metrics = self
+            threading.Thread(target=self._server.serve_forever, name="epo-metrics-http", daemon=True).start()
+        return self
+
+    def close(self):
+        """Stop background export and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.write()
+
+    def _advance_rate(self):
+        """Recompute documents/sec over the interval since the previous call."""
+        with self._lock:
+            now = time.monotonic()
+            last_time, last_docs = self._last_rate
+            docs = self._counters["docs"]
+            self._recent_docs_per_sec = (docs - last_docs) / max(now - last_time, 1e-9)
+            self._last_rate = (now, docs)
+
+    def _flush_loop(self):
+        # The only place the recent-rate window moves, so every reader sees the same value
+        while not self._stop.wait(self.interval):
+            self._advance_rate()
+            try:
+                self.write()
+            except OSError as e:
+                logging.getLogger(__name__).warning(f"Failed to write metrics to {self.path}: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve /metrics (Prometheus text) and /metrics.json."""
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(metrics.snapshot(), indent=2).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = metrics.prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
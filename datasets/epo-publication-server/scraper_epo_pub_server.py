@@ -30,17 +30,35 @@ discover: Find and store document URLs in database
     --db-path PATH           SQLite database path (default: epo.db)
     --ends-with SUFFIX       Document type suffix (default: B1 for granted patents)
     --max-workers N          Concurrent workers (default: 12)
+    --no-pooling             Open a new connection per request instead of keep-alive sessions
+    --rate N                 Initial requests/sec (default: 20; adapts between 1 and --max-rate)
+    --max-rate N             Upper bound for the adaptive request rate (default: 200)
+    --refresh                Re-check already discovered dates instead of skipping them
 
 scrape: Process stored documents 
-    MODE                     'claims' (extract to JSONL) or 'xml' (save raw XML files)
+    MODE                     'claims' (extract to JSONL), 'xml' (save raw XML files) or 'all'
+                             (claims, raw XML and coarse-cleaned text from one download)
     --db-path PATH           SQLite database path (default: epo.db)
     --output-dir PATH        Output directory (required)
     --start-date YYYYMMDD    Only process documents from this date onward (optional)
     --end-date YYYYMMDD      Only process documents up to this date (optional)
-    --max-workers N          Concurrent workers (default: 12)
+    --max-workers N          Concurrent workers (default: 12; claim-parsing processes with --engine async)
+    --no-pooling             Open a new connection per request instead of keep-alive sessions
+    --rate N                 Initial requests/sec (default: 20; adapts between 1 and --max-rate)
+    --max-rate N             Upper bound for the adaptive request rate (default: 200)
+    --engine ENGINE          'threads' (ThreadPoolExecutor, default) or 'async' (asyncio + httpx)
+    --concurrency N          Requests in flight with --engine async (default: 200)
+    --parser PARSER          Claims parser: 'stream' (root + English claims only, default) or 'dom' (full tree + XPath)
+    --storage STORAGE        XML output of xml/all modes: 'files' (default) or 'shards' (compressed per-date shards)
+
+    --metrics-file PATH      Write a JSON metrics snapshot (stage timings, p50/p95/p99, docs/sec) periodically
+    --metrics-interval SECS  Seconds between metrics snapshots (default: 10)
+    --metrics-port PORT      Serve Prometheus-style metrics on http://127.0.0.1:PORT/metrics
 
 stats: Show processing statistics
     --db-path PATH           SQLite database path (default: epo.db)
+    --history N              Also show documents processed in the last N buckets
+    --bucket BUCKET          History bucket: 'minute', 'hour' (default) or 'day'
 
 EXAMPLES:
 
@@ -56,6 +74,16 @@ python epo_pub_scraper.py scrape xml --output-dir xml_data
 # Check what's been processed
 python epo_pub_scraper.py stats
 
+# Claims, compressed XML and cleaned descriptions in one pass over the network
+python epo_pub_scraper.py scrape all --output-dir data --storage shards
+
+# Fetch a full year of claims with the async engine, 300 requests in flight
+python epo_pub_scraper.py scrape claims --output-dir claims_data --engine async --concurrency 300
+
+# Export live metrics while scraping, then look at the throughput history
+python epo_pub_scraper.py scrape xml --output-dir xml_data --metrics-file metrics.json --metrics-port 9108
+python epo_pub_scraper.py stats --history 24
+
 # Resume failed downloads (automatically skips completed ones)
 python epo_pub_scraper.py scrape claims --output-dir claims_data
 
@@ -63,6 +91,9 @@ OUTPUT FORMATS:
 
 Claims mode (--mode claims):
 - Creates JSONL files named by date: YYYYMMDD.jsonl
+- Records are buffered per date by one writer thread and fsynced in batches; a
+  YYYYMMDD.jsonl.ckpt sidecar holds the durable length, and documents are marked
+  completed only once their record is durable (see jsonl_writer.py)
 - Each line: {"pn": "EP1234567B1", "c": {"1": "claim text...", "2": "..."}}
 - Only includes English claims
 - Skips documents with no English claims
@@ -72,6 +103,35 @@ XML mode (--mode xml):
 - Saves raw XML files: xml_data/YYYYMMDD/1.xml, xml_data/YYYYMMDD/2.xml, etc.
 - Uses sequential numbering to avoid filename collisions
 - Preserves complete patent document structure
+- With --storage shards: appends gzip-compressed documents to xml_data/YYYYMMDD.xml.gz
+  with an offset index in xml_data/YYYYMMDD.idx (see xml_store.py for the reader API);
+  documents are group-committed and marked completed once their flush is fsynced
+
+All mode (--mode all):
+- Downloads and parses each document once and writes all three outputs:
+  data/claims/YYYYMMDD.jsonl (as claims mode), data/xml/ (as XML mode, honours --storage)
+  and data/clean/YYYYMMDD.jsonl with {"pn", "date", "description", "claim1"} records cleaned
+  exactly like 2-coarse_cleaning.py (which also adds the source "filename")
+- Sets claims_status and xml_status in one UPDATE once the raw XML and the JSONL records
+  are durable; if a record fails to write, only its side is marked failed (the cleaned
+  record counts towards xml_status)
+- Only picks up documents pending in both modes; finish the rest with scrape claims/xml
+
+CONNECTIONS:
+
+Each worker thread keeps its own keep-alive requests.Session (gzip/deflate
+transfer), so consecutive document.xml fetches reuse the TCP/TLS connection
+instead of paying a handshake per document. See bench_http_pooling.py for a local
+comparison against per-request connections.
+
+RATE LIMITING:
+
+All requests (both engines, discovery included) pass through one adaptive token
+bucket. The rate starts at --rate and grows additively while responses come back
+fast; 429/5xx answers, connection errors and slow responses halve it. A run of
+consecutive failures opens a circuit breaker that pauses every worker (5s, doubling
+on repeated trips), and Retry-After headers are honoured. Failed requests are retried
+up to 10 times with full-jitter exponential backoff; other 4xx answers fail at once.
 
 DATABASE SCHEMA:
 
@@ -80,41 +140,333 @@ documents table tracks processing status independently:
 - xml_status: pending/completed/failed  
 - Timestamps and error messages for debugging
 
+The database runs in WAL mode. During a scrape, status updates are queued to a
+single writer thread that commits them in batches, so `stats` and pending-document
+queries keep working (and see every update queued so far) while workers run.
+
+Discovery is incremental. Each date's documents are written as soon as its listing
+returns, and the date is then marked completed in the dates table; later runs skip
+completed dates unless --refresh is given. Listing pages are cached in the listings
+table with their ETag/Last-Modified validators and re-requested conditionally, so
+unchanged listings come back as 304 Not Modified without a body.
+
 This allows flexible processing - you can extract claims from some documents
 while saving raw XML from others, resume failed jobs independently, and 
 process specific date ranges efficiently.
 """
 
 import argparse
+import asyncio
+import bisect
+import importlib
 import json
 import logging
 import os
+import queue
+import random
+import re
 import sqlite3
 import sys
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
+import time
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from bs4 import BeautifulSoup
 from bs4.filter import SoupStrainer
 from lxml import etree
-from retry import retry
 from tqdm import tqdm
 
+from jsonl_writer import JSONLWriter
+from scrape_metrics import ScrapeMetrics
+from xml_store import XMLShardWriter
+
+
+def _claim_text(claim) -> str:
+    """Join the whitespace-normalised text of every <claim-text> under a <claim>."""
+    texts = []
+    for ctext in claim.xpath('.//claim-text'):
+        text_content = " ".join(s.strip() for s in ctext.xpath('.//text()') if s and s.strip())
+        if text_content:
+            texts.append(text_content)
+    return "\n".join(texts).strip()
+
+
+def _root_pn(root) -> str:
+    """Build the publication number (e.g. EP1234567B1) from the root element attributes."""
+    country = root.get('country', '') or ''
+    number = root.get('doc-number', '') or ''
+    kind = root.get('kind', '') or ''
+    return f"{country}{number}{kind}".strip()
+
+
+def extract_claims(xml_bytes: bytes) -> Optional[Dict]:
+    """Extract English claims from patent XML as {"pn": ..., "c": {num: text}}.
+    
+    Module-level so it can be shipped to a process pool; raises on unparseable XML.
+    """
+    parser = etree.XMLParser(recover=True)
+    root = etree.fromstring(xml_bytes, parser=parser)
+    return _claims_from_root(root)
+
+
+def _claims_from_root(root) -> Optional[Dict]:
+    """Claims record of an already parsed document (see extract_claims)."""
+    pn = _root_pn(root)
+    
+    if not pn:
+        return None
+    
+    claims_dict = {}
+    for claim in root.xpath('//claims[@lang="en"]//claim'):
+        num = (claim.get('num') or '').lstrip('0')
+        if not num:
+            continue
+        
+        claim_text = _claim_text(claim)
+        if claim_text:
+            claims_dict[num] = claim_text
+    
+    return {"pn": pn, "c": claims_dict} if claims_dict else None
+
+
+def _coarse_cleaning():
+    """The 2-coarse_cleaning.py module (its file name is not a valid identifier)."""
+    return importlib.import_module("2-coarse_cleaning")
+
+
+def extract_all(xml_bytes: bytes) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Parse a document once and return (claims record, coarse-cleaned record).
+    
+    The claims record matches extract_claims. Comments are then stripped, which leaves
+    the same tree 2-coarse_cleaning.py gets from its remove_comments parser, so the
+    cleaned record matches its clean_root output. Raises on unparseable XML.
+    """
+    root = etree.fromstring(xml_bytes, parser=etree.XMLParser(recover=True))
+    if root is None:
+        raise ValueError("Document could not be parsed")
+    claims_data = _claims_from_root(root)
+    etree.strip_tags(root, etree.Comment)
+    return claims_data, _coarse_cleaning().clean_root(root)
+
+
+# Elements that get iterparse events: claims plus the block-level containers whose
+# subtrees are discarded as they close. Events for every element would cost more in
+# Python callbacks than the full DOM build saves.
+STREAM_TAGS = (
+    'claims', 'claim',
+    'SDOBI', 'abstract', 'description', 'drawings', 'ep-reference-list', 'search-report-data',
+    'heading', 'p', 'tables', 'table', 'chemistry', 'maths', 'figure', 'img',
+)
+
+
+def _extract_claims_iterparse(xml_bytes: bytes) -> Optional[Dict]:
+    """Incremental equivalent of extract_claims built on lxml iterparse.
+    
+    Reads the root attributes at the first event, keeps only the subtree of each
+    English <claim> until its end event and clears every other block (and its
+    already-seen siblings) as soon as it closes, so descriptions, tables and chemistry
+    never accumulate into a full DOM.
+    """
+    context = etree.iterparse(BytesIO(xml_bytes), events=('start', 'end'), tag=STREAM_TAGS, recover=True)
+    pn = None
+    en_claims_depth = 0
+    claim_depth = 0
+    claims_dict = {}
+    
+    for event, elem in context:
+        if pn is None:
+            pn = _root_pn(elem.getroottree().getroot())
+            if not pn:
+                return None
+        
+        is_en_claims = elem.tag == 'claims' and elem.get('lang') == 'en'
+        is_claim = en_claims_depth and elem.tag == 'claim'
+        num = (elem.get('num') or '').lstrip('0') if is_claim else ''
+        
+        if event == 'start':
+            if is_en_claims:
+                en_claims_depth += 1
+            elif is_claim:
+                claim_depth += 1
+                # Reserve the slot now so keys keep document order, as with the XPath walk
+                if num and num not in claims_dict:
+                    claims_dict[num] = None
+            continue
+        
+        if is_claim:
+            claim_text = _claim_text(elem) if num else ''
+            if claim_text:
+                claims_dict[num] = claim_text
+            elif num and claims_dict.get(num) is None:
+                claims_dict.pop(num, None)
+            claim_depth -= 1
+        elif is_en_claims:
+            en_claims_depth -= 1
+        
+        if claim_depth or (en_claims_depth and not is_claim):
+            # Inside an English claim (or between claims): keep the subtree until it closes
+            continue
+        
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+    
+    if pn is None:
+        # No block-level element at all: still honour the root attributes like the DOM path
+        if context.root is None:
+            raise etree.XMLSyntaxError("Document is empty", None, 0, 0)
+        pn = _root_pn(context.root)
+    
+    return {"pn": pn, "c": claims_dict} if pn and claims_dict else None
+
+
+_CLAIMS_START_RE = re.compile(rb'<claims[\s>]')
+# Sections whose content is not markup, by the byte after their "<"
+_OPAQUE_SECTIONS = {b'!': ((b'<!--', b'-->'), (b'<![CDATA[', b']]>')), b'?': ((b'<?', b'?>'),)}
+_LANG_EN_RE = re.compile(rb'\slang\s*=\s*["\']en["\']')
+_XML_ENCODING_RE = re.compile(rb'^\s*<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)')
+
+
+def _opaque_spans(xml_bytes: bytes) -> Optional[List[Tuple[int, int]]]:
+    """(start, end) of every comment, CDATA section and processing instruction, in order.
+    
+    None if one of them is unterminated. Openers are found through their "!" or "?"
+    byte, which are rare in patent XML and located with a plain byte search.
+    """
+    spans = []
+    found = {marker: xml_bytes.find(marker) for marker in _OPAQUE_SECTIONS}
+    pos = 0
+    while True:
+        for marker, index in found.items():
+            if -1 < index < pos:
+                found[marker] = index = xml_bytes.find(marker, pos)
+        candidates = [index for index in found.values() if index != -1]
+        if not candidates:
+            return spans
+        index = min(candidates)
+        pos = index + 1
+        for opener, closer in _OPAQUE_SECTIONS[xml_bytes[index:index + 1]]:
+            if xml_bytes.startswith(opener, index - 1):
+                end = xml_bytes.find(closer, index - 1 + len(opener))
+                if end == -1:
+                    return None
+                spans.append((index - 1, end + len(closer)))
+                pos = end + len(closer)
+                break
+
+
+def _read_root(xml_bytes: bytes, chunk_size: int = 4096):
+    """Feed the document to a pull parser only until the root start tag has been seen."""
+    parser = etree.XMLPullParser(events=('start',), recover=True)
+    for offset in range(0, len(xml_bytes), chunk_size):
+        parser.feed(xml_bytes[offset:offset + chunk_size])
+        for _, elem in parser.read_events():
+            return elem
+    return None
+
+
+def extract_claims_streaming(xml_bytes: bytes) -> Optional[Dict]:
+    """Streaming equivalent of extract_claims that only parses what it returns.
+    
+    The root attributes come from an incremental pull parser stopped at the root start
+    tag, and each <claims lang="en"> block is located by a byte scan and parsed on its
+    own, so the description is never parsed at all. Documents where that shortcut is not
+    safe (non-UTF-8 encodings, unterminated comments, CDATA sections or processing
+    instructions, unterminated or malformed claims blocks, entities the standalone block
+    cannot resolve) fall back to the iterparse path. <claims> tags inside comments, CDATA
+    sections and processing instructions are skipped, as the DOM path never sees them.
+    """
+    declared = _XML_ENCODING_RE.match(xml_bytes)
+    if declared and declared.group(1).lower() not in (b'utf-8', b'utf8'):
+        return _extract_claims_iterparse(xml_bytes)
+    
+    root = _read_root(xml_bytes)
+    if root is None:
+        return _extract_claims_iterparse(xml_bytes)
+    pn = _root_pn(root)
+    if not pn:
+        return None
+    
+    claims_dict = {}
+    strict_parser = etree.XMLParser(recover=False)
+    spans = None
+    for match in _CLAIMS_START_RE.finditer(xml_bytes):
+        if spans is None:
+            spans = _opaque_spans(xml_bytes)
+            if spans is None:
+                return _extract_claims_iterparse(xml_bytes)
+            span_starts = [start for start, _ in spans]
+        k = bisect.bisect_right(span_starts, match.start()) - 1
+        if k >= 0 and match.start() < spans[k][1]:
+            continue
+        tag_end = xml_bytes.find(b'>', match.start())
+        if tag_end == -1:
+            return _extract_claims_iterparse(xml_bytes)
+        if not _LANG_EN_RE.search(xml_bytes, match.start(), tag_end):
+            continue
+        block_end = xml_bytes.find(b'</claims>', tag_end)
+        if block_end == -1:
+            return _extract_claims_iterparse(xml_bytes)
+        
+        try:
+            claims = etree.fromstring(xml_bytes[match.start():block_end + len(b'</claims>')], parser=strict_parser)
+        except etree.XMLSyntaxError:
+            return _extract_claims_iterparse(xml_bytes)
+        
+        for claim in claims.iter('claim'):
+            if claim is claims:
+                continue
+            num = (claim.get('num') or '').lstrip('0')
+            if not num:
+                continue
+            claim_text = _claim_text(claim)
+            if claim_text:
+                claims_dict[num] = claim_text
+    
+    return {"pn": pn, "c": claims_dict} if claims_dict else None
+
+
+CLAIM_PARSERS = {
+    'stream': extract_claims_streaming,
+    'dom': extract_claims,
+}
+
 
 class EPODatabase:
-    """SQLite database manager for EPO scraper."""
+    """SQLite database manager for EPO scraper.
+    
+    Status updates are written directly by default. Inside `batched_writes()` they are
+    queued to a single writer thread that owns one connection and commits them in
+    batches of `batch_size` or every `flush_interval` seconds, whichever comes first.
+    """
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, batch_size: int = 500, flush_interval: float = 1.0):
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._write_queue = None
+        self._writer_thread = None
+        self.metrics: Optional[ScrapeMetrics] = None
         self.init_db()
     
     def init_db(self):
         """Initialize database tables."""
         with sqlite3.connect(self.db_path) as conn:
+            # WAL lets readers (stats, pending queries) run alongside the status writer
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS dates (
                     date TEXT PRIMARY KEY,
@@ -138,9 +490,15 @@ class EPODatabase:
                     FOREIGN KEY (date) REFERENCES dates (date)
                 )
             """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_claims_status ON documents (claims_status)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_xml_status ON documents (xml_status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS listings (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB,
+                    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
             
             # Migrate existing data if needed
             try:
@@ -159,6 +517,20 @@ class EPODatabase:
                     conn.execute("SELECT doc_index FROM documents LIMIT 1")
                 except sqlite3.OperationalError:
                     conn.execute("ALTER TABLE documents ADD COLUMN doc_index INTEGER")
+            
+            # Per-date index lookups (MAX(doc_index), known URLs) during discovery
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_date_index ON documents (date, doc_index)")
+            
+            # Keyset pagination indexes for iter_pending_documents; they also serve
+            # status lookups, so the old single-column status indexes are dropped to
+            # keep bulk inserts cheaper
+            for status_col in ('claims_status', 'xml_status'):
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_documents_{status_col}_order "
+                    f"ON documents ({status_col}, date, COALESCE(doc_index, 0), url)"
+                )
+            for index_name in ('idx_documents_date', 'idx_documents_claims_status', 'idx_documents_xml_status'):
+                conn.execute(f"DROP INDEX IF EXISTS {index_name}")
     
     def add_dates(self, dates: List[str]):
         """Add discovered dates to database."""
@@ -168,72 +540,307 @@ class EPODatabase:
                 [(date,) for date in dates]
             )
     
-    def add_documents(self, documents: List[Dict[str, str]]):
-        """Add discovered document URLs to database with sequential indices."""
+    def get_completed_dates(self) -> Set[str]:
+        """Dates whose document listing has been fully discovered."""
         with sqlite3.connect(self.db_path) as conn:
-            # Group documents by date to assign sequential indices per date
-            by_date = {}
-            for doc in documents:
-                date = doc['date']
-                if date not in by_date:
-                    by_date[date] = []
-                by_date[date].append(doc)
+            return {row[0] for row in conn.execute("SELECT date FROM dates WHERE status = 'completed'")}
+    
+    def add_date_documents(self, date: str, documents: List[Dict[str, str]]) -> int:
+        """Add one date's documents and mark the date completed in a single transaction.
+        
+        Returns the number of documents that were not already in the database.
+        """
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("INSERT OR IGNORE INTO dates (date) VALUES (?)", (date,))
+            before = conn.total_changes
+            self._insert_documents(conn, documents)
+            added = conn.total_changes - before
+            conn.execute("UPDATE dates SET status = 'completed' WHERE date = ?", (date,))
+            return added
+    
+    def get_listing(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], bytes]]:
+        """Cached (etag, last_modified, body) for a listing page, or None."""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            return conn.execute(
+                "SELECT etag, last_modified, body FROM listings WHERE url = ?", (url,)
+            ).fetchone()
+    
+    def save_listing(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes):
+        """Cache a listing page together with its validators."""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO listings (url, etag, last_modified, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                (url, etag, last_modified, body)
+            )
+    
+    def add_documents(self, documents: List[Dict[str, str]]):
+        """Add discovered document URLs to database with sequential indices.
+        
+        The whole batch is written in a single transaction: URL inserts land all over
+        the primary-key index, so committing per date would rewrite (and checkpoint)
+        most of that index once per date.
+        """
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._insert_documents(conn, documents)
+    
+    @staticmethod
+    def _insert_documents(conn: sqlite3.Connection, documents: List[Dict[str, str]]):
+        """Insert documents on an open connection without committing.
+        
+        Indices are assigned in memory per date, continuing after the current max
+        index; URLs already stored for the date keep their index, so re-discovering a
+        date does not leave gaps. Each date is written with a single executemany.
+        """
+        by_date = {}
+        for doc in documents:
+            by_date.setdefault(doc['date'], []).append(doc)
+        
+        for date, date_docs in by_date.items():
+            max_index = conn.execute(
+                "SELECT COALESCE(MAX(doc_index), 0) FROM documents WHERE date = ?",
+                (date,)
+            ).fetchone()[0]
+            if max_index:
+                known = {row[0] for row in conn.execute("SELECT url FROM documents WHERE date = ?", (date,))}
+            else:
+                known = set()
             
-            for date, date_docs in by_date.items():
-                # Get the current max index for this date
-                cursor = conn.execute(
-                    "SELECT COALESCE(MAX(doc_index), 0) FROM documents WHERE date = ?",
-                    (date,)
-                )
-                max_index = cursor.fetchone()[0]
-                
-                # Insert documents with sequential indices
-                for i, doc in enumerate(date_docs, start=max_index + 1):
-                    conn.execute(
-                        "INSERT OR IGNORE INTO documents (url, date, doc_id, doc_index) VALUES (?, ?, ?, ?)",
-                        (doc['url'], doc['date'], doc['doc_id'], i)
-                    )
+            rows = []
+            for doc in date_docs:
+                url = doc['url']
+                if url in known:
+                    continue
+                known.add(url)
+                rows.append((url, date, doc['doc_id'], max_index + len(rows) + 1))
+            
+            conn.executemany(
+                "INSERT OR IGNORE INTO documents (url, date, doc_id, doc_index) VALUES (?, ?, ?, ?)",
+                rows
+            )
     
-    def get_pending_documents(self, mode: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, str]]:
-        """Get pending documents to process for specific mode (claims/xml)."""
+    @staticmethod
+    def _pending_filter(mode: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
+        """Build the WHERE clause and parameters selecting pending documents for a mode.
+        
+        Mode 'all' selects documents still pending in both claims and XML mode.
+        """
         if mode == 'claims':
-            status_col = 'claims_status'
+            where = "claims_status = 'pending'"
         elif mode == 'xml':
-            status_col = 'xml_status'
+            where = "xml_status = 'pending'"
+        elif mode == 'all':
+            where = "claims_status = 'pending' AND xml_status = 'pending'"
         else:
             raise ValueError(f"Invalid mode: {mode}")
         
-        query = f"SELECT url, date, doc_id, doc_index FROM documents WHERE {status_col} = 'pending'"
         params = []
         
         if start_date:
-            query += " AND date >= ?"
+            where += " AND date >= ?"
             params.append(start_date)
         
         if end_date:
-            query += " AND date <= ?"
+            where += " AND date <= ?"
             params.append(end_date)
         
-        query += " ORDER BY date, doc_index"
-        
+        return where, params
+    
+    def count_pending_documents(self, mode: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
+        """Count pending documents for specific mode (claims/xml)."""
+        where, params = self._pending_filter(mode, start_date, end_date)
+        self.flush()
         with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(query, params)
-            return [{'url': row[0], 'date': row[1], 'doc_id': row[2], 'doc_index': row[3]} for row in cursor.fetchall()]
+            return conn.execute(f"SELECT COUNT(*) FROM documents WHERE {where}", params).fetchone()[0]
     
-    def mark_document_processed(self, url: str, mode: str, status: str = 'completed', error: Optional[str] = None):
-        """Mark document as processed for specific mode."""
+    def iter_pending_documents(self, mode: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                               page_size: int = 1000) -> Iterator[Dict[str, str]]:
+        """Stream pending documents in (date, doc_index) order, one keyset page at a time.
+        
+        Each page resumes after the last (date, doc_index, url) key seen, so documents
+        marked processed while iterating neither shift pages nor get yielded twice, and
+        no read transaction is held open between pages.
+        """
+        where, params = self._pending_filter(mode, start_date, end_date)
+        query = (
+            f"SELECT url, date, doc_id, doc_index, COALESCE(doc_index, 0) FROM documents "
+            f"WHERE {where} AND (date, COALESCE(doc_index, 0), url) > (?, ?, ?) "
+            f"ORDER BY date, COALESCE(doc_index, 0), url LIMIT ?"
+        )
+        key = ('', -1, '')
+        
+        self.flush()
+        while True:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(query, [*params, *key, page_size]).fetchall()
+            
+            for row in rows:
+                yield {'url': row[0], 'date': row[1], 'doc_id': row[2], 'doc_index': row[3]}
+            
+            if len(rows) < page_size:
+                return
+            last = rows[-1]
+            key = (last[1], last[4], last[0])
+    
+    def get_pending_documents(self, mode: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, str]]:
+        """Get pending documents to process for specific mode (claims/xml)."""
+        return list(self.iter_pending_documents(mode, start_date, end_date))
+    
+    @staticmethod
+    def _status_query(mode: str) -> str:
+        """Get the UPDATE statement that records a status for a specific mode."""
         if mode == 'claims':
-            query = "UPDATE documents SET claims_status = ?, claims_error = ?, claims_processed_at = CURRENT_TIMESTAMP WHERE url = ?"
+            return "UPDATE documents SET claims_status = ?, claims_error = ?, claims_processed_at = CURRENT_TIMESTAMP WHERE url = ?"
         elif mode == 'xml':
-            query = "UPDATE documents SET xml_status = ?, xml_error = ?, xml_processed_at = CURRENT_TIMESTAMP WHERE url = ?"
+            return "UPDATE documents SET xml_status = ?, xml_error = ?, xml_processed_at = CURRENT_TIMESTAMP WHERE url = ?"
         else:
             raise ValueError(f"Invalid mode: {mode}")
+    
+    def mark_document_processed(self, url: str, mode: str, status: str = 'completed', error: Optional[str] = None):
+        """Mark document as processed for specific mode."""
+        query = self._status_query(mode)
+        
+        if self._write_queue is not None:
+            self._write_queue.put(('update', query, (status, error, url)))
+            return
         
         with sqlite3.connect(self.db_path) as conn:
             conn.execute(query, (status, error, url))
     
+    ALL_STATUS_QUERY = (
+        "UPDATE documents SET claims_status = ?, claims_error = ?, claims_processed_at = CURRENT_TIMESTAMP, "
+        "xml_status = ?, xml_error = ?, xml_processed_at = CURRENT_TIMESTAMP WHERE url = ?"
+    )
+    
+    def mark_document_processed_all(self, url: str, claims_status: str = 'completed', xml_status: str = 'completed',
+                                     claims_error: Optional[str] = None, xml_error: Optional[str] = None):
+        """Record the claims and XML outcome of a fused scrape in a single UPDATE."""
+        params = (claims_status, claims_error, xml_status, xml_error, url)
+        
+        if self._write_queue is not None:
+            self._write_queue.put(('update', self.ALL_STATUS_QUERY, params))
+            return
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(self.ALL_STATUS_QUERY, params)
+    
+    @contextmanager
+    def batched_writes(self):
+        """Route status updates through the batching writer thread for the duration of the block."""
+        self.start_writer()
+        try:
+            yield self
+        finally:
+            self.stop_writer()
+    
+    def start_writer(self):
+        """Start the single writer thread if it is not already running."""
+        if self._writer_thread is not None:
+            return
+        self._write_queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="epo-db-writer", daemon=True)
+        self._writer_thread.start()
+    
+    def stop_writer(self):
+        """Commit outstanding updates and stop the writer thread."""
+        if self._writer_thread is None:
+            return
+        self._write_queue.put(('stop', None, None))
+        self._writer_thread.join()
+        self._writer_thread = None
+        self._write_queue = None
+    
+    def flush(self):
+        """Block until every status update queued so far is committed."""
+        if self._write_queue is None:
+            return
+        done = threading.Event()
+        self._write_queue.put(('flush', None, done))
+        done.wait()
+    
+    def _writer_loop(self):
+        """Drain the write queue, committing updates in one transaction per batch."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        pending = {}
+        pending_count = 0
+        deadline = None
+        
+        def commit() -> bool:
+            nonlocal pending, pending_count
+            if not pending_count:
+                return True
+            start = time.perf_counter()
+            try:
+                with conn:
+                    for query, rows in pending.items():
+                        conn.executemany(query, rows)
+            except sqlite3.Error as e:
+                # Keep the batch and retry on the next flush
+                self.logger.error(f"Failed to commit {pending_count} status updates: {e}")
+                return False
+            if self.metrics is not None:
+                self.metrics.observe('db', time.perf_counter() - start)
+            pending = {}
+            pending_count = 0
+            return True
+        
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, query, payload = self._write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    kind, query, payload = 'tick', None, None
+                
+                if kind == 'update':
+                    pending.setdefault(query, []).append(payload)
+                    pending_count += 1
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if pending_count < self.batch_size:
+                        continue
+                
+                if commit():
+                    deadline = None
+                else:
+                    deadline = time.monotonic() + self.flush_interval
+                
+                if kind == 'flush':
+                    payload.set()
+                elif kind == 'stop':
+                    return
+        finally:
+            conn.close()
+    
+    def get_throughput_history(self, mode: str, bucket: str = 'hour', limit: int = 24) -> List[Tuple[str, int, int]]:
+        """(bucket start, documents processed, documents completed) per time bucket, newest first.
+        
+        Built from the claims_processed_at / xml_processed_at timestamps (UTC).
+        """
+        if mode not in ('claims', 'xml'):
+            raise ValueError(f"Invalid mode: {mode}")
+        formats = {'minute': '%Y-%m-%d %H:%M', 'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d'}
+        if bucket not in formats:
+            raise ValueError(f"Invalid bucket: {bucket}")
+        
+        self.flush()
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(f"""
+                SELECT strftime('{formats[bucket]}', {mode}_processed_at) AS bucket,
+                       COUNT(*),
+                       SUM({mode}_status = 'completed')
+                FROM documents
+                WHERE {mode}_processed_at IS NOT NULL
+                GROUP BY bucket
+                ORDER BY bucket DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+    
     def get_stats(self) -> Dict[str, Dict[str, int]]:
         """Get processing statistics."""
+        self.flush()
         with sqlite3.connect(self.db_path) as conn:
             # Claims stats
             cursor = conn.execute("""
@@ -269,16 +876,209 @@ class EPODatabase:
             }
 
 
+def _timed_call(fn: Callable, *args):
+    """Call fn in a worker process and return (result, seconds spent)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+# Responses worth retrying; everything else >= 400 fails the request immediately
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by all workers, with AIMD rate control and a circuit breaker.
+    
+    Every request calls `reserve()` and waits the returned delay before sending, then
+    reports its outcome with `record()`:
+    - a success answered within `latency_target` raises the rate additively, by about
+      `increase` requests/sec for every second of traffic
+    - 429/5xx, connection errors and slow answers multiply the rate by `decrease`, at
+      most once per `decrease_interval`, so one burst of failures counts once
+    - `failure_threshold` consecutive failures open the circuit: every worker is held
+      back for `cooldown` seconds, doubling on each trip until a request succeeds.
+      A Retry-After header holds the pool back the same way.
+    
+    Reservations may run the bucket into debt; later callers queue behind it, so
+    waiting workers are released at the current rate instead of all at once.
+    """
+    
+    def __init__(self, rate: float = 20.0, min_rate: float = 1.0, max_rate: float = 200.0,
+                 increase: float = 2.0, decrease: float = 0.5, latency_target: float = 2.0,
+                 decrease_interval: float = 1.0, failure_threshold: int = 10,
+                 cooldown: float = 5.0, max_cooldown: float = 300.0):
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.decrease_interval = decrease_interval
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._open_until = 0.0
+        self._failures = 0
+        self._trips = 0
+    
+    def reserve(self) -> float:
+        """Take one token and return how many seconds the caller must wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._open_until)
+            elapsed = max(0.0, start - self._updated)
+            self._tokens = min(max(1.0, self.rate), self._tokens + elapsed * self.rate)
+            self._updated = max(self._updated, start)
+            self._tokens -= 1
+            delay = start - now
+            if self._tokens < 0:
+                delay += -self._tokens / self.rate
+            return delay
+    
+    def acquire(self):
+        """Block until the caller may send a request."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def record(self, status: Optional[int], latency: Optional[float] = None, retry_after: Optional[float] = None):
+        """Report a request outcome; `status` is None for connection errors and timeouts."""
+        failed = status is None or status in RETRY_STATUSES
+        slow = latency is not None and latency > self.latency_target
+        
+        with self._lock:
+            now = time.monotonic()
+            if failed:
+                self._failures += 1
+            else:
+                self._failures = 0
+                self._trips = 0
+            
+            if failed or slow:
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self._last_decrease = now
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            
+            pause = min(retry_after or 0.0, self.max_cooldown)
+            if self._failures >= self.failure_threshold:
+                pause = max(pause, min(self.max_cooldown, self.cooldown * 2 ** self._trips))
+                self._trips += 1
+                self._failures = 0
+                self.logger.warning(
+                    f"Circuit open after {self.failure_threshold} consecutive failures: "
+                    f"pausing requests for {pause:.1f}s (rate now {self.rate:.1f}/s)"
+                )
+            if pause and now + pause > self._open_until:
+                self._open_until = now + pause
+
+
+def _timed_connection_pool(pool_cls, connection_cls, on_connect: Callable[[float], None]):
+    """Subclass of a urllib3 pool whose connections report how long connect() took."""
+    class TimedConnection(connection_cls):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            on_connect(time.perf_counter() - start)
+    
+    return type(f"Timed{pool_cls.__name__}", (pool_cls,), {'ConnectionCls': TimedConnection})
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that reports the DNS + TCP/TLS setup time of every new connection."""
+    
+    def __init__(self, on_connect: Callable[[float], None], **kwargs):
+        self.on_connect = on_connect
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _timed_connection_pool(HTTPConnectionPool, HTTPConnection, self.on_connect),
+            'https': _timed_connection_pool(HTTPSConnectionPool, HTTPSConnection, self.on_connect),
+        }
+
+
+class _Countdown:
+    """Call on_done(errors) once each of `n` records of a document is durable or has failed.
+    
+    `errors` maps the name of every record whose write failed to its exception, so
+    the caller can fail only the outputs that are actually missing. Callbacks arrive
+    from the JSONL writer thread and the XML shard writer thread (or the worker, for
+    plain XML files), so arrivals are counted under a lock.
+    """
+    
+    def __init__(self, n: int, on_done: Callable[[Dict[str, Exception]], None]):
+        self.remaining = n
+        self.errors: Dict[str, Exception] = {}
+        self.on_done = on_done
+        self._lock = threading.Lock()
+    
+    def durable(self):
+        self._arrive()
+    
+    def failer(self, name: str) -> Callable[[Exception], None]:
+        """Error callback for the record called name."""
+        def failed(error: Exception):
+            with self._lock:
+                self.errors.setdefault(name, error)
+            self._arrive()
+        return failed
+    
+    def _arrive(self):
+        with self._lock:
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done:
+            self.on_done(self.errors)
+
+
 class EPOScraper:
     """EPO Publication Server Scraper."""
     
-    def __init__(self, max_workers: int = 12, timeout: int = 5, retries: int = 10):
+    def __init__(self, max_workers: int = 12, timeout: int = 5, retries: int = 10, pooled: bool = True,
+                 parser: str = 'stream', rate: float = 20.0, max_rate: float = 200.0,
+                 backoff_base: float = 1.0, max_backoff: float = 60.0, metrics: Optional[ScrapeMetrics] = None):
         self.max_workers = max_workers
         self.timeout = timeout
         self.retries = retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.limiter = AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
+        self.metrics = metrics or ScrapeMetrics()
+        self.metrics.gauge('rate_limit', lambda: round(self.limiter.rate, 3))
+        self.pooled = pooled
+        self.extract_claims = CLAIM_PARSERS[parser]
         self.base_url = "https://data.epo.org"
-        self._file_locks = {}
         self._global_lock = threading.Lock()
+        self._xml_writer = None
+        self._claims_writer = None
+        self._local = threading.local()
+        self._sessions = []
         
         # Setup logging
         logging.basicConfig(
@@ -291,27 +1091,126 @@ class EPOScraper:
         )
         self.logger = logging.getLogger(__name__)
     
-    @retry(tries=10, delay=1, backoff=1, jitter=(1, 3))
-    def _get_response(self, url: str) -> Optional[requests.Response]:
-        """Get HTTP response with retry logic."""
-        try:
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            self.logger.warning(f"Request failed for {url}: {e}")
+    def _get_session(self) -> requests.Session:
+        """Get the calling thread's keep-alive session, creating it on first use."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._new_session()
+            session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            self._local.session = session
+            with self._global_lock:
+                self._sessions.append(session)
+        return session
+    
+    def _new_session(self) -> requests.Session:
+        """Session whose new connections are timed as the 'connect' stage."""
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(lambda seconds: self.metrics.observe('connect', seconds))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def close(self):
+        """Close all pooled sessions and their connections."""
+        with self._global_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+    
+    def _record_response(self, status_code: int, elapsed: float, headers) -> Optional[float]:
+        """Report a response to the rate limiter and return its Retry-After, if retryable."""
+        retry_after = None
+        if status_code in RETRY_STATUSES:
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+        self.limiter.record(status_code, elapsed, retry_after)
+        return retry_after
+    
+    def _get_response(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
+        """GET through the rate limiter, retrying 429/5xx and connection errors with backoff.
+        
+        Returns None for other HTTP errors or once `retries` attempts are used up.
+        """
+        error = None
+        for attempt in range(self.retries):
+            self.limiter.acquire()
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                if self.pooled:
+                    response = self._get_session().get(url, headers=headers, timeout=self.timeout)
+                else:
+                    with self._new_session() as session:
+                        response = session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.limiter.record(None)
+                error = e
+            else:
+                retry_after = self._record_response(
+                    response.status_code, response.elapsed.total_seconds(), response.headers
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code >= 400:
+                        self.logger.warning(f"Request failed for {url}: HTTP {response.status_code}")
+                        return None
+                    # elapsed stops at the response headers; the rest of the call read the body
+                    headers_at = response.elapsed.total_seconds()
+                    self.metrics.observe('request', headers_at)
+                    self.metrics.observe('download', max(0.0, time.perf_counter() - start - headers_at))
+                    self.metrics.count('bytes', len(response.content))
+                    return response
+                error = f"HTTP {response.status_code}"
+            
+            if attempt + 1 < self.retries:
+                time.sleep(self._backoff_delay(attempt, retry_after))
+        
+        self.logger.warning(f"Request failed for {url} after {self.retries} attempts: {error}")
+        return None
+    
+    def _get_listing(self, url: str, db: Optional[EPODatabase] = None) -> Optional[bytes]:
+        """Fetch a listing page body.
+        
+        With a database, the page is cached in the listings table and revalidated with
+        If-None-Match/If-Modified-Since; a 304 answer returns the cached body.
+        """
+        cached = db.get_listing(url) if db else None
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        response = self._get_response(url, headers=headers)
+        if response is None:
+            return None
+        
+        if response.status_code == 304:
+            if cached:
+                self.logger.debug(f"Listing not modified: {url}")
+                return cached[2]
+            self.logger.warning(f"Unexpected 304 for uncached listing {url}")
             return None
+        
+        if db:
+            db.save_listing(url, response.headers.get('ETag'), response.headers.get('Last-Modified'), response.content)
+        return response.content
     
-    def discover_dates(self, start_date: str, end_date: str) -> List[str]:
+    def discover_dates(self, start_date: str, end_date: str, db: Optional[EPODatabase] = None) -> List[str]:
         """Discover available publication dates."""
         url = f"{self.base_url}/publication-server/rest/v1.2/publication-dates/"
-        response = self._get_response(url)
+        content = self._get_listing(url, db)
         
-        if not response:
+        if not content:
             self.logger.error(f"Failed to fetch publication dates from {url}")
             return []
         
-        soup = BeautifulSoup(response.content, 'html.parser', parse_only=SoupStrainer('a'))
+        soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer('a'))
         links = [link.get('href') for link in soup if link and link.get('href')]
         
         start_dt = datetime.strptime(start_date, '%Y%m%d')
@@ -332,17 +1231,31 @@ class EPOScraper:
     
     def discover_documents(self, dates: List[str], ends_with: str = "B1") -> Dict[str, List[Dict[str, str]]]:
         """Discover document URLs for given dates."""
-        results = {}
+        results = {
+            date: documents or []
+            for date, documents in self.iter_discovered_documents(dates, ends_with)
+        }
+        
+        total_docs = sum(len(docs) for docs in results.values())
+        self.logger.info(f"Discovered {total_docs} documents across {len(dates)} dates")
+        return results
+    
+    def iter_discovered_documents(self, dates: List[str], ends_with: str = "B1",
+                                  db: Optional[EPODatabase] = None) -> Iterator[Tuple[str, Optional[List[Dict[str, str]]]]]:
+        """Yield (date, documents) as each date's listing returns.
         
+        `documents` is None when the listing could not be fetched. With a database,
+        listings are fetched conditionally through the listings cache.
+        """
         def process_date(date: str):
             url = f"{self.base_url}/publication-server/rest/v1.2/publication-dates/{date}/patents"
-            response = self._get_response(url)
+            content = self._get_listing(url, db)
             
-            if not response:
+            if not content:
                 self.logger.error(f"Failed to fetch documents for date {date}")
-                return date, []
+                return date, None
             
-            soup = BeautifulSoup(response.content, 'html.parser', parse_only=SoupStrainer('a'))
+            soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer('a'))
             documents = []
             
             for link in soup:
@@ -362,65 +1275,166 @@ class EPOScraper:
             future_to_date = {executor.submit(process_date, date): date for date in dates}
             
             for future in tqdm(as_completed(future_to_date), total=len(dates), desc="Discovering documents"):
-                date, documents = future.result()
-                results[date] = documents
-        
-        total_docs = sum(len(docs) for docs in results.values())
-        self.logger.info(f"Discovered {total_docs} documents across {len(dates)} dates")
-        return results
-    
-    def _get_file_lock(self, key: str):
-        """Get thread-safe file lock."""
-        with self._global_lock:
-            if key not in self._file_locks:
-                self._file_locks[key] = threading.Lock()
-            return self._file_locks[key]
+                yield future.result()
     
     def _extract_claims_json(self, xml_bytes: bytes) -> Optional[Dict]:
         """Extract claims from XML and return as JSON."""
-        parser = etree.XMLParser(recover=True)
         try:
-            root = etree.fromstring(xml_bytes, parser=parser)
+            with self.metrics.timer('parse'):
+                return self.extract_claims(xml_bytes)
         except Exception as e:
             self.logger.error(f"XML parsing error: {e}")
             return None
+    
+    @contextmanager
+    def _claims_storage(self, output_path: Path):
+        """Run a buffered per-date JSONL writer for _save_claims for the duration of the block."""
+        self._claims_writer = JSONLWriter(
+            output_path, on_flush=lambda seconds: self.metrics.observe('flush', seconds)
+        )
+        try:
+            yield
+        finally:
+            self._claims_writer.close()
+            self._claims_writer = None
+    
+    def _save_claims(self, db: EPODatabase, doc: Dict[str, str], claims_data: Dict):
+        """Queue one claims record for the document's date-specific JSONL file.
         
-        country = root.get('country', '') or ''
-        number = root.get('doc-number', '') or ''
-        kind = root.get('kind', '') or ''
-        pn = f"{country}{number}{kind}".strip()
+        The document is marked completed (or failed) by the writer thread once the
+        record has been fsynced and checkpointed, not here.
+        """
+        url = doc['url']
+        with self.metrics.timer('write'):
+            self._claims_writer.submit(
+                doc['date'],
+                json.dumps(claims_data, ensure_ascii=False),
+                on_durable=lambda: db.mark_document_processed(url, 'claims', 'completed'),
+                on_error=lambda e: db.mark_document_processed(url, 'claims', 'failed', str(e)),
+            )
+    
+    def _save_xml(self, output_path: Path, doc: Dict[str, str], content: bytes,
+                  on_durable: Callable[[], None], on_error: Callable[[Exception], None]):
+        """Save raw XML under its date subdirectory, named by doc_index to avoid collisions.
         
-        if not pn:
-            return None
+        A plain file is written here and on_durable runs before returning; with shard
+        storage the document is queued, and the shard writer thread runs on_durable or
+        on_error once its flush has been fsynced or has failed.
+        """
+        with self.metrics.timer('write'):
+            if self._xml_writer is not None:
+                self._xml_writer.submit(doc['date'], doc['doc_index'], doc['doc_id'], content,
+                                        on_durable=on_durable, on_error=on_error)
+                return
+            date_dir = output_path / doc['date']
+            date_dir.mkdir(exist_ok=True)
+            with open(date_dir / f"{doc['doc_index']}.xml", 'wb') as f:
+                f.write(content)
+        on_durable()
+    
+    def _extract_all(self, xml_bytes: bytes) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Claims and coarse-cleaned records from one parse; (None, None) if the XML is unusable."""
+        try:
+            with self.metrics.timer('parse'):
+                return extract_all(xml_bytes)
+        except Exception as e:
+            self.logger.error(f"XML parsing error: {e}")
+            return None, None
+    
+    def _save_all(self, db: EPODatabase, output_path: Path, doc: Dict[str, str], content: bytes,
+                  claims_data: Optional[Dict], clean_data: Optional[Dict]) -> int:
+        """Store one document in every output and record both statuses in one UPDATE.
         
-        claims_dict = {}
-        for claim in root.xpath('//claims[@lang="en"]//claim'):
-            num = (claim.get('num') or '').lstrip('0')
-            if not num:
-                continue
-            
-            texts = []
-            for ctext in claim.xpath('.//claim-text'):
-                text_content = " ".join(s.strip() for s in ctext.xpath('.//text()') if s and s.strip())
-                if text_content:
-                    texts.append(text_content)
-            
-            claim_text = "\n".join(texts)
-            if claim_text:
-                claims_dict[num] = claim_text.strip()
+        The raw XML is saved first; the claims and cleaned records then go through the
+        JSONL writer, and the document is marked once the XML and all of its records are
+        durable or failed. claims_status follows the claims record; xml_status follows the
+        raw XML and the cleaned record derived from it. Only the side whose record failed
+        is marked failed, so a durable claims record is never written again by scrape claims.
+        Returns 1 once the raw XML is accepted, with or without claims and cleaned records.
+        """
+        url = doc['url']
+        claims_error = None if claims_data else 'No claims found'
+        records = []
+        if claims_data:
+            records.append(('claims', claims_data))
+        if clean_data:
+            records.append(('clean', clean_data))
+        
+        def mark(errors: Dict[str, Exception]):
+            if 'xml' in errors:
+                xml_error = str(errors['xml'])
+            elif 'clean' in errors:
+                xml_error = f"Clean record: {errors['clean']}"
+            else:
+                xml_error = None
+            db.mark_document_processed_all(
+                url,
+                'failed' if 'claims' in errors else 'completed',
+                'failed' if xml_error else 'completed',
+                str(errors['claims']) if 'claims' in errors else claims_error,
+                xml_error,
+            )
+        
+        countdown = _Countdown(len(records) + 1, on_done=mark)
+        try:
+            self._save_xml(output_path / 'xml', doc, content,
+                           on_durable=countdown.durable, on_error=countdown.failer('xml'))
+        except Exception as e:
+            db.mark_document_processed_all(url, 'failed', 'failed', str(e), str(e))
+            self.logger.error(f"Error saving XML for {url}: {e}")
+            return 0
+        if not records:
+            return 1
+        
+        with self.metrics.timer('write'):
+            for name, record in records:
+                self._claims_writer.submit(f"{name}/{doc['date']}", json.dumps(record, ensure_ascii=False),
+                                           on_durable=countdown.durable, on_error=countdown.failer(name))
+        return 1
+    
+    def _run_bounded(self, executor: ThreadPoolExecutor, fn: Callable[[Dict[str, str]], int],
+                     docs: Iterable[Dict[str, str]], progress: tqdm) -> int:
+        """Run fn over docs, keeping at most 4 x max_workers futures outstanding.
+        
+        Documents are pulled from the iterator only as slots free up, so memory stays flat
+        however large the backlog is and the first download starts immediately.
+        """
+        window = self.max_workers * 4
+        in_flight = set()
+        processed_count = 0
+        
+        def collect(futures):
+            nonlocal processed_count
+            for future in futures:
+                in_flight.discard(future)
+                try:
+                    saved = future.result()
+                    processed_count += saved
+                    self.metrics.count('saved', saved)
+                except Exception as e:
+                    self.logger.error(f"Document processing error: {e}")
+                self.metrics.count('docs')
+                progress.update(1)
+        
+        for doc in docs:
+            if len(in_flight) >= window:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(executor.submit(fn, doc))
         
-        return {"pn": pn, "c": claims_dict} if claims_dict else None
+        collect(as_completed(list(in_flight)))
+        return processed_count
     
     def scrape_claims(self, db: EPODatabase, output_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
         """Scrape claims and save as JSONL."""
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        pending_docs = db.get_pending_documents('claims', start_date, end_date)
+        pending_count = db.count_pending_documents('claims', start_date, end_date)
         date_range_str = ""
         if start_date or end_date:
             date_range_str = f" (dates: {start_date or 'start'} to {end_date or 'end'})"
-        self.logger.info(f"Processing {len(pending_docs)} pending documents for claims extraction{date_range_str}")
+        self.logger.info(f"Processing {pending_count} pending documents for claims extraction{date_range_str}")
         
         def process_document(doc: Dict[str, str]) -> int:
             response = self._get_response(doc['url'])
@@ -433,43 +1447,51 @@ class EPOScraper:
                 db.mark_document_processed(doc['url'], 'claims', 'completed', 'No claims found')
                 return 0
             
-            # Write to date-specific JSONL file
-            output_file = output_path / f"{doc['date']}.jsonl"
-            lock = self._get_file_lock(doc['date'])
-            
             try:
-                with lock, open(output_file, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(claims_data, ensure_ascii=False) + '\n')
-                
-                db.mark_document_processed(doc['url'], 'claims', 'completed')
+                self._save_claims(db, doc, claims_data)
                 return 1
             except Exception as e:
                 db.mark_document_processed(doc['url'], 'claims', 'failed', str(e))
                 self.logger.error(f"Error writing claims for {doc['url']}: {e}")
                 return 0
         
-        processed_count = 0
-        with ThreadPoolExecutor(self.max_workers) as executor:
-            futures = [executor.submit(process_document, doc) for doc in pending_docs]
-            
-            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing claims"):
-                try:
-                    processed_count += future.result()
-                except Exception as e:
-                    self.logger.error(f"Document processing error: {e}")
+        pending_docs = db.iter_pending_documents('claims', start_date, end_date)
+        with db.batched_writes(), self._claims_storage(output_path), \
+                ThreadPoolExecutor(self.max_workers) as executor, \
+                tqdm(total=pending_count, desc="Processing claims") as progress:
+            processed_count = self._run_bounded(executor, process_document, pending_docs, progress)
         
         self.logger.info(f"Successfully processed {processed_count} documents for claims")
+        self.logger.info(f"Metrics: {self.metrics.summary()}")
+    
+    @contextmanager
+    def _xml_storage(self, output_path: Path, storage: str):
+        """Route _save_xml to per-date compressed shards for the duration of the block."""
+        if storage == 'files':
+            yield
+            return
+        if storage != 'shards':
+            raise ValueError(f"Invalid storage: {storage}")
+        self._xml_writer = XMLShardWriter(
+            output_path, on_flush=lambda seconds: self.metrics.observe('flush', seconds)
+        )
+        try:
+            yield
+        finally:
+            self._xml_writer.close()
+            self._xml_writer = None
     
-    def scrape_xml(self, db: EPODatabase, output_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
-        """Scrape raw XML documents."""
+    def scrape_xml(self, db: EPODatabase, output_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   storage: str = 'files'):
+        """Scrape raw XML documents, as one file per document or into compressed per-date shards."""
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        pending_docs = db.get_pending_documents('xml', start_date, end_date)
+        pending_count = db.count_pending_documents('xml', start_date, end_date)
         date_range_str = ""
         if start_date or end_date:
             date_range_str = f" (dates: {start_date or 'start'} to {end_date or 'end'})"
-        self.logger.info(f"Processing {len(pending_docs)} pending documents for XML extraction{date_range_str}")
+        self.logger.info(f"Processing {pending_count} pending documents for XML extraction{date_range_str}")
         
         def process_document(doc: Dict[str, str]) -> int:
             response = self._get_response(doc['url'])
@@ -477,35 +1499,240 @@ class EPOScraper:
                 db.mark_document_processed(doc['url'], 'xml', 'failed', 'HTTP request failed')
                 return 0
             
-            # Create date subdirectory
-            date_dir = output_path / doc['date']
-            date_dir.mkdir(exist_ok=True)
-            
-            # Save XML file using index to avoid collisions
-            xml_file = date_dir / f"{doc['doc_index']}.xml"
-            
+            url = doc['url']
             try:
-                with open(xml_file, 'wb') as f:
-                    f.write(response.content)
-                
-                db.mark_document_processed(doc['url'], 'xml', 'completed')
+                self._save_xml(output_path, doc, response.content,
+                               on_durable=lambda: db.mark_document_processed(url, 'xml', 'completed'),
+                               on_error=lambda e: db.mark_document_processed(url, 'xml', 'failed', str(e)))
                 return 1
             except Exception as e:
                 db.mark_document_processed(doc['url'], 'xml', 'failed', str(e))
                 self.logger.error(f"Error saving XML for {doc['url']}: {e}")
                 return 0
         
-        processed_count = 0
-        with ThreadPoolExecutor(self.max_workers) as executor:
-            futures = [executor.submit(process_document, doc) for doc in pending_docs]
+        pending_docs = db.iter_pending_documents('xml', start_date, end_date)
+        with db.batched_writes(), self._xml_storage(output_path, storage), \
+                ThreadPoolExecutor(self.max_workers) as executor, \
+                tqdm(total=pending_count, desc="Processing XML") as progress:
+            processed_count = self._run_bounded(executor, process_document, pending_docs, progress)
+        
+        self.logger.info(f"Successfully processed {processed_count} documents for XML")
+        self.logger.info(f"Metrics: {self.metrics.summary()}")
+    
+    def scrape_all(self, db: EPODatabase, output_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   storage: str = 'files'):
+        """Download and parse each document once, writing claims, raw XML and the cleaned record.
+        
+        Covers documents still pending in both modes; output goes to output_dir/claims,
+        output_dir/xml and output_dir/clean.
+        """
+        output_path = Path(output_dir)
+        (output_path / 'xml').mkdir(parents=True, exist_ok=True)
+        
+        pending_count = db.count_pending_documents('all', start_date, end_date)
+        date_range_str = ""
+        if start_date or end_date:
+            date_range_str = f" (dates: {start_date or 'start'} to {end_date or 'end'})"
+        self.logger.info(f"Processing {pending_count} pending documents for all outputs{date_range_str}")
+        
+        def process_document(doc: Dict[str, str]) -> int:
+            response = self._get_response(doc['url'])
+            if not response:
+                db.mark_document_processed_all(doc['url'], 'failed', 'failed',
+                                               'HTTP request failed', 'HTTP request failed')
+                return 0
             
-            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing XML"):
+            claims_data, clean_data = self._extract_all(response.content)
+            return self._save_all(db, output_path, doc, response.content, claims_data, clean_data)
+        
+        pending_docs = db.iter_pending_documents('all', start_date, end_date)
+        with db.batched_writes(), self._xml_storage(output_path / 'xml', storage), \
+                self._claims_storage(output_path), \
+                ThreadPoolExecutor(self.max_workers) as executor, \
+                tqdm(total=pending_count, desc="Processing all") as progress:
+            processed_count = self._run_bounded(executor, process_document, pending_docs, progress)
+        
+        self.logger.info(f"Successfully processed {processed_count} documents for all outputs")
+        self.logger.info(f"Metrics: {self.metrics.summary()}")
+    
+    def scrape_async(self, db: EPODatabase, mode: str, output_dir: str, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None, concurrency: int = 200, storage: str = 'files'):
+        """Scrape claims, raw XML or all outputs with an asyncio download engine.
+        
+        Keeps up to `concurrency` requests in flight on one event loop, parses documents in a
+        process pool of `max_workers` and runs file writes off the loop, with the
+        same status updates and output layout as scrape_claims/scrape_xml/scrape_all. Status
+        updates are queued to the database's batching writer, so they never block the loop.
+        """
+        if mode not in ('claims', 'xml', 'all'):
+            raise ValueError(f"Invalid mode: {mode}")
+        
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        xml_path = output_path / 'xml' if mode == 'all' else output_path
+        xml_path.mkdir(exist_ok=True)
+        
+        pending_count = db.count_pending_documents(mode, start_date, end_date)
+        date_range_str = ""
+        if start_date or end_date:
+            date_range_str = f" (dates: {start_date or 'start'} to {end_date or 'end'})"
+        self.logger.info(f"Processing {pending_count} pending documents for {mode} extraction{date_range_str} "
+                         f"with async engine ({concurrency} in flight)")
+        
+        pending_docs = db.iter_pending_documents(mode, start_date, end_date)
+        with db.batched_writes(), self._xml_storage(xml_path, storage if mode != 'claims' else 'files'), \
+                (self._claims_storage(output_path) if mode != 'xml' else nullcontext()):
+            processed_count = asyncio.run(
+                self._scrape_async(db, mode, output_path, pending_docs, pending_count, concurrency)
+            )
+        self.logger.info(f"Successfully processed {processed_count} documents for {mode}")
+        self.logger.info(f"Metrics: {self.metrics.summary()}")
+    
+    def _observe_async_timings(self, start: float, marks: Dict[str, float]):
+        """Split an httpx request into connect/request/download using its trace events."""
+        end = time.perf_counter()
+        connect_start = marks.get('connection.connect_tcp.started')
+        connect_end = marks.get('connection.start_tls.complete') or marks.get('connection.connect_tcp.complete')
+        if connect_start and connect_end:
+            self.metrics.observe('connect', connect_end - connect_start)
+        headers_at = (marks.get('http11.receive_response_headers.complete')
+                      or marks.get('http2.receive_response_headers.complete') or end)
+        self.metrics.observe('request', headers_at - start)
+        self.metrics.observe('download', end - headers_at)
+    
+    async def _get_content_async(self, client, url: str) -> Optional[bytes]:
+        """Get response body with an async HTTP client, with the same pacing and retries as _get_response."""
+        import httpx
+        
+        error = None
+        for attempt in range(self.retries):
+            delay = self.limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            retry_after = None
+            marks = {}
+            
+            async def trace(event_name: str, info: Dict):
+                marks[event_name] = time.perf_counter()
+            
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, extensions={'trace': trace})
+            except httpx.HTTPError as e:
+                self.limiter.record(None)
+                error = e
+            else:
+                retry_after = self._record_response(
+                    response.status_code, response.elapsed.total_seconds(), response.headers
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code >= 400:
+                        self.logger.warning(f"Request failed for {url}: HTTP {response.status_code}")
+                        return None
+                    self._observe_async_timings(start, marks)
+                    self.metrics.count('bytes', len(response.content))
+                    return response.content
+                error = f"HTTP {response.status_code}"
+            
+            if attempt + 1 < self.retries:
+                await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+        
+        self.logger.warning(f"Request failed for {url} after {self.retries} attempts: {error}")
+        return None
+    
+    async def _scrape_async(self, db: EPODatabase, mode: str, output_path: Path, pending_docs: Iterator[Dict[str, str]],
+                            pending_count: int, concurrency: int) -> int:
+        import httpx
+        
+        loop = asyncio.get_running_loop()
+        limits = httpx.Limits(
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency if self.pooled else 0,
+        )
+        progress = tqdm(total=pending_count, desc=f"Processing {mode} (async)")
+        parse_executor = ProcessPoolExecutor(self.max_workers) if mode != 'xml' else None
+        
+        async def process_document(client, doc: Dict[str, str]) -> int:
+            content = await self._get_content_async(client, doc['url'])
+            if content is None:
+                if mode == 'all':
+                    db.mark_document_processed_all(doc['url'], 'failed', 'failed',
+                                                   'HTTP request failed', 'HTTP request failed')
+                else:
+                    db.mark_document_processed(doc['url'], mode, 'failed', 'HTTP request failed')
+                return 0
+            
+            if mode == 'all':
+                try:
+                    (claims_data, clean_data), parse_seconds = await loop.run_in_executor(
+                        parse_executor, _timed_call, extract_all, content
+                    )
+                    self.metrics.observe('parse', parse_seconds)
+                except Exception as e:
+                    self.logger.error(f"XML parsing error: {e}")
+                    claims_data, clean_data = None, None
+                return await asyncio.to_thread(
+                    self._save_all, db, output_path, doc, content, claims_data, clean_data
+                )
+            
+            if mode == 'claims':
+                try:
+                    claims_data, parse_seconds = await loop.run_in_executor(
+                        parse_executor, _timed_call, self.extract_claims, content
+                    )
+                    self.metrics.observe('parse', parse_seconds)
+                except Exception as e:
+                    self.logger.error(f"XML parsing error: {e}")
+                    claims_data = None
+                if not claims_data:
+                    db.mark_document_processed(doc['url'], mode, 'completed', 'No claims found')
+                    return 0
+            
+            try:
+                if mode == 'claims':
+                    # Off the loop only because submit blocks while the writer queue is full
+                    await asyncio.to_thread(self._save_claims, db, doc, claims_data)
+                else:
+                    # Off the loop for the file write, or because submit blocks while the shard queue is full
+                    url = doc['url']
+                    await asyncio.to_thread(
+                        self._save_xml, output_path, doc, content,
+                        lambda: db.mark_document_processed(url, mode, 'completed'),
+                        lambda e: db.mark_document_processed(url, mode, 'failed', str(e)),
+                    )
+                return 1
+            except Exception as e:
+                db.mark_document_processed(doc['url'], mode, 'failed', str(e))
+                self.logger.error(f"Error saving {mode} for {doc['url']}: {e}")
+                return 0
+        
+        async def worker(client) -> int:
+            # Workers share one iterator, so at most `concurrency` documents are in flight
+            count = 0
+            for doc in pending_docs:
                 try:
-                    processed_count += future.result()
+                    saved = await process_document(client, doc)
+                    count += saved
+                    self.metrics.count('saved', saved)
                 except Exception as e:
                     self.logger.error(f"Document processing error: {e}")
+                self.metrics.count('docs')
+                progress.update(1)
+            return count
         
-        self.logger.info(f"Successfully processed {processed_count} documents for XML")
+        try:
+            async with httpx.AsyncClient(
+                limits=limits,
+                timeout=self.timeout,
+                headers={'Accept-Encoding': 'gzip, deflate'},
+            ) as client:
+                counts = await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        finally:
+            progress.close()
+            if parse_executor:
+                parse_executor.shutdown()
+        
+        return sum(counts)
 
 
 def main():
@@ -519,19 +1746,37 @@ def main():
     discover_parser.add_argument('--db-path', default='epo.db', help='SQLite database path')
     discover_parser.add_argument('--ends-with', default='B1', help='Document type suffix (default: B1)')
     discover_parser.add_argument('--max-workers', type=int, default=12, help='Max concurrent workers')
+    discover_parser.add_argument('--no-pooling', action='store_true', help='Open a new connection per request')
+    discover_parser.add_argument('--rate', type=float, default=20.0, help='Initial requests/sec (adapts up to --max-rate)')
+    discover_parser.add_argument('--max-rate', type=float, default=200.0, help='Upper bound for the adaptive request rate')
+    discover_parser.add_argument('--refresh', action='store_true',
+                                 help='Re-check dates that were already discovered (conditional requests)')
     
     # Scrape command
     scrape_parser = subparsers.add_parser('scrape', help='Scrape documents from database')
-    scrape_parser.add_argument('mode', choices=['claims', 'xml'], help='Scraping mode')
+    scrape_parser.add_argument('mode', choices=['claims', 'xml', 'all'], help='Scraping mode')
     scrape_parser.add_argument('--db-path', default='epo.db', help='SQLite database path')
     scrape_parser.add_argument('--output-dir', required=True, help='Output directory')
     scrape_parser.add_argument('--start-date', help='Start date for scraping (YYYYMMDD)')
     scrape_parser.add_argument('--end-date', help='End date for scraping (YYYYMMDD)')
     scrape_parser.add_argument('--max-workers', type=int, default=12, help='Max concurrent workers')
+    scrape_parser.add_argument('--no-pooling', action='store_true', help='Open a new connection per request')
+    scrape_parser.add_argument('--rate', type=float, default=20.0, help='Initial requests/sec (adapts up to --max-rate)')
+    scrape_parser.add_argument('--max-rate', type=float, default=200.0, help='Upper bound for the adaptive request rate')
+    scrape_parser.add_argument('--engine', choices=['threads', 'async'], default='threads', help='Download engine')
+    scrape_parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight with --engine async')
+    scrape_parser.add_argument('--parser', choices=list(CLAIM_PARSERS), default='stream', help='Claims XML parser')
+    scrape_parser.add_argument('--storage', choices=['files', 'shards'], default='files',
+                               help='XML output (xml and all modes): one file per document or compressed per-date shards')
+    scrape_parser.add_argument('--metrics-file', help='Write a JSON metrics snapshot to this file periodically')
+    scrape_parser.add_argument('--metrics-interval', type=float, default=10.0, help='Seconds between metrics snapshots')
+    scrape_parser.add_argument('--metrics-port', type=int, help='Serve Prometheus-style metrics on 127.0.0.1:PORT/metrics')
     
     # Stats command
     stats_parser = subparsers.add_parser('stats', help='Show database statistics')
     stats_parser.add_argument('--db-path', default='epo.db', help='SQLite database path')
+    stats_parser.add_argument('--history', type=int, default=0, help='Show throughput for the last N time buckets')
+    stats_parser.add_argument('--bucket', choices=['minute', 'hour', 'day'], default='hour', help='Throughput history bucket size')
     
     args = parser.parse_args()
     
@@ -540,39 +1785,66 @@ def main():
         sys.exit(1)
     
     if args.command == 'discover':
-        scraper = EPOScraper(max_workers=args.max_workers)
+        scraper = EPOScraper(max_workers=args.max_workers, pooled=not args.no_pooling,
+                             rate=args.rate, max_rate=args.max_rate)
         db = EPODatabase(args.db_path)
         
-        # Discover dates
-        dates = scraper.discover_dates(args.start_date, args.end_date)
-        if not dates:
-            print("No dates found in the specified range")
-            sys.exit(1)
-        
-        db.add_dates(dates)
-        
-        # Discover documents
-        documents_by_date = scraper.discover_documents(dates, args.ends_with)
-        
-        # Add to database
-        all_documents = []
-        for date_docs in documents_by_date.values():
-            all_documents.extend(date_docs)
+        try:
+            # Discover dates
+            dates = scraper.discover_dates(args.start_date, args.end_date, db)
+            if not dates:
+                print("No dates found in the specified range")
+                sys.exit(1)
+            
+            db.add_dates(dates)
+            
+            # Skip dates whose listing was already fully discovered
+            if not args.refresh:
+                completed = db.get_completed_dates()
+                skipped = sum(1 for date in dates if date in completed)
+                dates = [date for date in dates if date not in completed]
+                if skipped:
+                    print(f"Skipping {skipped} already discovered dates (use --refresh to re-check them)")
+            
+            # Discover documents, writing each date as soon as its listing returns
+            added = 0
+            failed_dates = 0
+            for date, documents in scraper.iter_discovered_documents(dates, args.ends_with, db):
+                if documents is None:
+                    failed_dates += 1
+                    continue
+                added += db.add_date_documents(date, documents)
+        finally:
+            scraper.close()
         
-        if all_documents:
-            db.add_documents(all_documents)
-            print(f"Added {len(all_documents)} documents to database")
+        if failed_dates:
+            print(f"Failed to fetch {failed_dates} date listings; they stay pending for the next run")
+        if added:
+            print(f"Added {added} documents to database")
         else:
-            print("No documents found")
+            print("No new documents found")
     
     elif args.command == 'scrape':
-        scraper = EPOScraper(max_workers=args.max_workers)
+        metrics = ScrapeMetrics(args.metrics_file, args.metrics_interval, args.metrics_port)
+        scraper = EPOScraper(max_workers=args.max_workers, pooled=not args.no_pooling, parser=args.parser,
+                             rate=args.rate, max_rate=args.max_rate, metrics=metrics)
         db = EPODatabase(args.db_path)
+        db.metrics = metrics
+        metrics.start()
         
-        if args.mode == 'claims':
-            scraper.scrape_claims(db, args.output_dir, args.start_date, args.end_date)
-        elif args.mode == 'xml':
-            scraper.scrape_xml(db, args.output_dir, args.start_date, args.end_date)
+        try:
+            if args.engine == 'async':
+                scraper.scrape_async(db, args.mode, args.output_dir, args.start_date, args.end_date, args.concurrency,
+                                     args.storage)
+            elif args.mode == 'claims':
+                scraper.scrape_claims(db, args.output_dir, args.start_date, args.end_date)
+            elif args.mode == 'xml':
+                scraper.scrape_xml(db, args.output_dir, args.start_date, args.end_date, args.storage)
+            elif args.mode == 'all':
+                scraper.scrape_all(db, args.output_dir, args.start_date, args.end_date, args.storage)
+        finally:
+            scraper.close()
+            metrics.close()
     
     elif args.command == 'stats':
         db = EPODatabase(args.db_path)
@@ -585,6 +1857,21 @@ def main():
         print(f"\nXML Processing:")
         for status, count in stats['xml'].items():
             print(f"  {status}: {count}")
+        
+        if args.history:
+            bucket_seconds = {'minute': 60, 'hour': 3600, 'day': 86400}[args.bucket]
+            now = datetime.now(timezone.utc)
+            for mode, label in (('claims', 'Claims'), ('xml', 'XML')):
+                history = db.get_throughput_history(mode, args.bucket, args.history)
+                if not history:
+                    continue
+                print(f"\n{label} throughput per {args.bucket} (UTC):")
+                for bucket, processed, completed in history:
+                    # The current bucket has only been filling since its start
+                    start = datetime.fromisoformat(bucket).replace(tzinfo=timezone.utc)
+                    elapsed = min(bucket_seconds, max(1.0, (now - start).total_seconds()))
+                    print(f"  {bucket}: {processed} processed, {completed} completed, "
+                          f"{processed / elapsed:.2f} docs/sec")
 
 
 if __name__ == '__main__':
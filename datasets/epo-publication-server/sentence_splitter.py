@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+sentence_splitter.py
+
+Rule-based sentence segmentation for cleaned patent text, shared by the
+boilerplate, condensation and synthetic-data stages.
+
+A sentence ends at a "." that is followed by whitespace or the end of the text,
+unless the word before it is an abbreviation. A paragraph break ("\\n\\n") always
+ends a sentence. So, unlike splitting on every ".":
+
+    "as shown in FIG. <NUM>, the valve"     one sentence (FIG., Figs., No., e.g., ...)
+    "a ratio of <NUM>.<NUM> to <NUM>"       one sentence (no space after the dot)
+    "see U.S. Pat. No. <NUM>. The valve"    two sentences, split after "<NUM>."
+    "there is no. Then the valve"           two sentences ("no" is only an abbreviation
+                                            before a number, like "p." and "pp.")
+
+Abbreviations are matched case-insensitively against a precompiled set, plus any
+word of 1-2 letter segments ending in a dotted letter ("e.g", "i.e", "U.S").
+Only the dots that are followed by whitespace are examined, found with one regex
+scan per text, and most of them are settled by the character or two before them.
+
+Results are (start, end) offsets into the text instead of copies: each span
+covers one sentence without its final "." and without surrounding whitespace.
+`split_many` segments a batch of texts; `split_sentences` returns the strings.
+"""
+
+import re
+from typing import List, Sequence, Tuple
+
+
+Span = Tuple[int, int]
+
+ABBREVIATIONS = frozenset({
+    "al", "approx", "ca", "cf", "ch", "col", "comp", "corp", "dept", "eq", "eqs", "esp", "etc", "ex", "fig",
+    "figs", "incl", "inc", "ltd", "para", "pat", "publ", "ref", "refs", "resp", "ser", "tab", "vol", "vs",
+    "viz", "wt",
+})
+# Also ordinary words ("there is no.", "a variable p."), so only abbreviations when a
+# number follows: "No. <NUM>", "Nos. 5", "p. 12", "pp. 3"
+NUMERIC_ABBREVIATIONS = frozenset({"no", "nos", "p", "pp"})
+_MAX_ABBREVIATION = 12
+_DOTTED_ABBREVIATION_REGEX = re.compile(r"(?:[a-z]{1,2}\.)+[a-z]")
+_NUMBER_REGEX = re.compile(r"\d|<NUM>")
+# Last two letters of the abbreviations, to rule out most words without a lookup
+_ABBREVIATION_ENDINGS = frozenset(abbr[-2:] for abbr in ABBREVIATIONS | NUMERIC_ABBREVIATIONS if len(abbr) > 1)
+_OPENING_PUNCTUATION = "([{\"'"
+
+# A "." followed by whitespace (spaces and tabs are consumed) or the end of the
+# text, or a paragraph break with any whitespace after it
+_BOUNDARY_REGEX = re.compile(r"\.(?:[ \t]+|(?=\s)|\Z)|\n\n\s*")
+
+
+def is_abbreviation(word: str, before_number: bool = False) -> bool:
+    """Whether the word before a "." (without the dot) is an abbreviation.
+
+    before_number says whether a number follows the dot, which NUMERIC_ABBREVIATIONS need.
+    """
+    word = word.lstrip(_OPENING_PUNCTUATION).lower()
+    if word in ABBREVIATIONS:
+        return True
+    if word in NUMERIC_ABBREVIATIONS:
+        return before_number
+    return "." in word and _DOTTED_ABBREVIATION_REGEX.fullmatch(word) is not None
+
+
+def _ends_with_abbreviation(text: str, i: int, boundary: "re.Match[str]") -> bool:
+    """Whether the word ending just before the "." at i (the start of boundary) is an abbreviation."""
+    # Every abbreviation ends in a letter, which rules out most dots (e.g. after "<NUM>"),
+    # and most words end in two letters no abbreviation ends in
+    if not i or not text[i - 1].isalpha():
+        return False
+    if i > 1 and text[i - 2].isalpha() and text[i - 2:i].lower() not in _ABBREVIATION_ENDINGS:
+        return False
+    low = max(0, i - _MAX_ABBREVIATION - 1)
+    word = text[low:i].rsplit(None, 1)[-1]
+    if len(word) > _MAX_ABBREVIATION:
+        return False
+    if word.lstrip(_OPENING_PUNCTUATION).lower() in NUMERIC_ABBREVIATIONS:
+        return _NUMBER_REGEX.match(text, boundary.end()) is not None
+    return is_abbreviation(word)
+
+
+def _strip_span(text: str, start: int, end: int) -> Span:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def paragraph_spans(text: str) -> List[List[Span]]:
+    """Sentence spans grouped by "\\n\\n"-separated paragraph; paragraphs without sentences are left out."""
+    paragraphs = []
+    sentences = []
+    start = 0
+    for match in _BOUNDARY_REGEX.finditer(text):
+        end = match.start()
+        paragraph_break = text[end] == "\n"
+        if not paragraph_break and _ends_with_abbreviation(text, end, match):
+            continue
+        if start < end and (text[start].isspace() or text[end - 1].isspace()):
+            start, end = _strip_span(text, start, end)
+        if start < end:
+            sentences.append((start, end))
+        start = match.end()
+        if paragraph_break and sentences:
+            paragraphs.append(sentences)
+            sentences = []
+    start, end = _strip_span(text, start, len(text))
+    if start < end:
+        sentences.append((start, end))
+    if sentences:
+        paragraphs.append(sentences)
+    return paragraphs
+
+
+def sentence_spans(text: str) -> List[Span]:
+    """(start, end) of every sentence of text."""
+    return [span for sentences in paragraph_spans(text) for span in sentences]
+
+
+def split_many(texts: Sequence[str]) -> List[List[Span]]:
+    """Sentence spans of each text of a batch."""
+    return [sentence_spans(text) for text in texts]
+
+
+def split_sentences(text: str) -> List[str]:
+    """The sentences of text as strings."""
+    return [text[start:end] for start, end in sentence_spans(text)]
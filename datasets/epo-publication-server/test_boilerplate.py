@@ -0,0 +1,16 @@
+"""Tests for boilerplate.py; run with `python -m pytest test_boilerplate.py`."""
+
+from boilerplate import BoilerplateMatcher
+
+
+def test_strip_sentences():
+    matcher = BoilerplateMatcher(sentences=["The valve is shown"], min_sentence_len=10)
+    text = "The valve is shown. It opens at <NUM> bar. Ok.\n\nThe valve is shown."
+
+    assert matcher.strip_sentences(text) == ("It opens at <NUM> bar.", 3)
+
+
+def test_paragraph_ending_in_abbreviation_keeps_one_dot():
+    matcher = BoilerplateMatcher(sentences=[], min_sentence_len=0)
+
+    assert matcher.strip_sentences("as in FIG.\n\nIt was ok. See Fig.") == ("as in FIG.\n\nIt was ok. See Fig.", 0)
@@ -0,0 +1,23 @@
+"""Tests for digest_set.py; run with `python -m pytest test_digest_set.py`."""
+
+import hashlib
+
+from digest_set import DigestSet
+
+
+def digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def test_repeats_across_merges_are_stored_once():
+    # buffer_size=1 merges after every new digest, so repeats hit the sorted arrays
+    digests = DigestSet([digest("a"), digest("b"), digest("a")], buffer_size=1)
+    assert len(digests) == 2
+
+    digests.add(digest("b"))
+    assert len(digests) == 2
+    assert not digests.add_new(digest("a"))
+    assert digests.add_new(digest("c"))
+    assert len(digests) == 3
+    assert all(digest(text) in digests for text in "abc")
+    assert digest("d") not in digests
@@ -0,0 +1,59 @@
+"""Tests for jsonl_writer.py; run with `python -m pytest test_jsonl_writer.py`."""
+
+import json
+import os
+import resource
+
+from jsonl_writer import CHECKPOINT_SUFFIX, JSONLWriter
+
+
+def write_dates(root, dates, max_open):
+    """Write two records per date in date order; return (durable, failed) record ids."""
+    durable, failed = [], []
+    writer = JSONLWriter(root, flush_interval=60.0, max_open=max_open)
+    for date in dates:
+        for i in range(2):
+            record_id = f"{date}-{i}"
+            writer.submit(date, json.dumps({"id": record_id}),
+                          on_durable=lambda record_id=record_id: durable.append(record_id),
+                          on_error=lambda e, record_id=record_id: failed.append(record_id))
+    writer.close()
+    return durable, failed
+
+
+def test_more_dates_than_open_files(tmp_path):
+    dates = [f"2024{day:04d}" for day in range(1, 301)]
+    durable, failed = write_dates(tmp_path, dates, max_open=4)
+
+    assert failed == []
+    assert sorted(durable) == sorted(f"{date}-{i}" for date in dates for i in range(2))
+    for date in dates:
+        path = tmp_path / f"{date}.jsonl"
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [f"{date}-0", f"{date}-1"]
+        checkpoint = path.with_name(path.name + CHECKPOINT_SUFFIX)
+        assert int(checkpoint.read_text()) == path.stat().st_size
+
+
+def test_file_descriptor_limit(tmp_path):
+    # Far more dates than free descriptors: evicted dates must be closed, not leaked
+    open_fds = len(os.listdir("/proc/self/fd"))
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (open_fds + 32, hard))
+    try:
+        durable, failed = write_dates(tmp_path, [f"2024{day:04d}" for day in range(1, 201)], max_open=8)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    assert failed == []
+    assert len(durable) == 400
+
+
+def test_reopened_date_appends(tmp_path):
+    # An evicted date that comes back is reopened at its checkpoint and appended to
+    durable, failed = write_dates(tmp_path, ["20240101", "20240102", "20240103", "20240101"], max_open=2)
+
+    assert failed == []
+    assert len(durable) == 8
+    ids = [json.loads(line)["id"] for line in (tmp_path / "20240101.jsonl").read_text().splitlines()]
+    assert ids == ["20240101-0", "20240101-1", "20240101-0", "20240101-1"]
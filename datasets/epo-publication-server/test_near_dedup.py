@@ -0,0 +1,31 @@
+"""Tests for near_dedup.py; run with `python -m pytest test_near_dedup.py`."""
+
+import numpy as np
+
+from near_dedup import BAND_DTYPE, band_candidates, clusters_from_pairs, verify
+
+
+def write_band(path, buckets):
+    """Band file with the documents of each bucket (lists of doc indices) under one key."""
+    entries = [(key, doc) for key, docs in enumerate(buckets, start=1) for doc in docs]
+    entries.sort(key=lambda entry: entry[1])
+    np.array(entries, dtype=BAND_DTYPE).tofile(path)
+
+
+def test_band_candidates(tmp_path):
+    path = tmp_path / "band-000.bin"
+    write_band(path, [[0, 2, 5, 7], [1, 3], [4], [6]])
+
+    pairs = {tuple(pair) for pair in band_candidates(path).tolist()}
+    assert pairs == {(0, 2), (0, 5), (0, 7), (2, 5), (5, 7), (1, 3)}
+
+
+def test_near_duplicates_behind_a_dissimilar_head(tmp_path):
+    # 1 and 2 share a bucket with 0 but only resemble each other
+    path = tmp_path / "band-000.bin"
+    write_band(path, [[0, 1, 2]])
+    signatures = np.array([[9, 9, 9, 9], [1, 2, 3, 4], [1, 2, 3, 5]], dtype=np.uint32)
+
+    pairs = verify(band_candidates(path), signatures, threshold=0.75)
+    assert pairs.tolist() == [[1, 2]]
+    assert clusters_from_pairs(pairs) == {1: 1, 2: 1}
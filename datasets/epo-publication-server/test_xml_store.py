@@ -0,0 +1,109 @@
+"""Tests for xml_store.py; run with `python -m pytest test_xml_store.py`."""
+
+import os
+import resource
+import threading
+
+from xml_store import XMLShardWriter, iter_documents, read_index, read_ref, read_ref_prefix
+
+
+def document(date, doc_index):
+    return f"<doc date='{date}' index='{doc_index}'>{'text ' * doc_index}</doc>".encode()
+
+
+def write_dates(root, dates, docs_per_date=3, **options):
+    """Submit docs_per_date documents per date in date order; return (durable, failed) (date, doc_index) pairs."""
+    durable, failed = [], []
+    writer = XMLShardWriter(root, **options)
+    for date in dates:
+        for doc_index in range(1, docs_per_date + 1):
+            key = (date, doc_index)
+            writer.submit(date, doc_index, f"EP{doc_index}", document(date, doc_index),
+                          on_durable=lambda key=key: durable.append(key),
+                          on_error=lambda e, key=key: failed.append(key))
+    writer.close()
+    return durable, failed
+
+
+def test_round_trip(tmp_path):
+    durable, failed = write_dates(tmp_path, ["20240103", "20240110"])
+
+    assert failed == []
+    assert len(durable) == 6
+    refs = read_index(tmp_path / "20240103.idx")
+    assert [ref.doc_index for ref in refs] == [1, 2, 3]
+    assert [read_ref(ref) for ref in refs] == [document("20240103", i) for i in (1, 2, 3)]
+    assert read_ref_prefix(refs[2], 10) == document("20240103", 3)[:10]
+    names = [name for name, _ in iter_documents(tmp_path)]
+    assert names == [f"{date}/{i}.xml" for date in ("20240103", "20240110") for i in (1, 2, 3)]
+
+
+def test_file_descriptor_limit(tmp_path):
+    # Far more dates than free descriptors: evicted shards must be closed, not leaked
+    open_fds = len(os.listdir("/proc/self/fd"))
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (open_fds + 32, hard))
+    try:
+        dates = [f"2024{day:04d}" for day in range(1, 201)]
+        durable, failed = write_dates(tmp_path, dates, max_open=4)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    assert failed == []
+    assert len(durable) == 600
+    assert len(list(iter_documents(tmp_path))) == 600
+
+
+def test_reopened_date_appends(tmp_path):
+    write_dates(tmp_path, ["20240101", "20240102", "20240103"], max_open=1)
+    write_dates(tmp_path, ["20240101"], docs_per_date=5)
+
+    # The second run stored doc_index 1-3 again; the last index entry wins
+    refs = read_index(tmp_path / "20240101.idx")
+    assert [ref.doc_index for ref in refs] == [1, 2, 3, 4, 5]
+    assert [read_ref(ref) for ref in refs] == [document("20240101", i) for i in range(1, 6)]
+
+
+def test_concurrent_submits(tmp_path):
+    writer = XMLShardWriter(tmp_path, flush_bytes=1 << 10)
+    durable = []
+
+    def work(worker):
+        for doc_index in range(worker * 100, worker * 100 + 100):
+            writer.submit("20240103", doc_index, f"EP{doc_index}", document("20240103", doc_index % 50),
+                          on_durable=lambda: durable.append(1))
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    assert len(durable) == 800
+    refs = read_index(tmp_path / "20240103.idx")
+    assert len(refs) == 800
+    assert all(read_ref(ref) == document("20240103", ref.doc_index % 50) for ref in refs)
+
+
+def test_failed_flush_is_rolled_back(tmp_path):
+    # flush_bytes=1 flushes after every document, so once the first is durable the
+    # shard is open and the writer is idle until the next submit
+    writer = XMLShardWriter(tmp_path, flush_bytes=1)
+    first_durable = threading.Event()
+    failed = []
+    writer.submit("20240103", 1, "EP1", document("20240103", 1), on_durable=first_durable.set)
+    assert first_durable.wait(timeout=10)
+    size = (tmp_path / "20240103.xml.gz").stat().st_size
+
+    # Break the index handle: the next member is written and fsynced, its index
+    # line is not, so the member must be cut off again
+    shard = writer._shards["20240103"]
+    shard.index_file.close()
+    shard.index_file = open(tmp_path / "20240103.idx", "rb")
+    writer.submit("20240103", 2, "EP2", document("20240103", 2), on_error=failed.append)
+    writer.close()
+
+    assert len(failed) == 1
+    assert (tmp_path / "20240103.xml.gz").stat().st_size == size
+    assert [ref.doc_index for ref in read_index(tmp_path / "20240103.idx")] == [1]
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+xml_store.py
+
+Compressed, sharded storage for raw EP XML documents, used by
+`scraper_epo_pub_server.py scrape xml --storage shards` and readable by the
+counting and cleaning scripts without unpacking anything to disk.
+
+Layout (one shard per publication date):
+    xml_data/YYYYMMDD.xml.gz   concatenated gzip members, one member per document
+    xml_data/YYYYMMDD.idx      tab-separated index: doc_index, offset, length, doc_id
+
+Each document is an independent gzip member, so any document can be read with a
+single seek + decompress, and the shard as a whole is still a valid gzip stream
+(`zcat 20240103.xml.gz` prints every document).
+
+Writes are group-committed like jsonl_writer.py: workers compress their document and
+hand the member to a single writer thread, which buffers members and index lines per
+date until `flush_bytes` are pending or `flush_interval` seconds have passed. A flush
+appends and fsyncs each dirty shard, then appends and fsyncs its index, and only then
+runs each document's `on_durable` callback, so the index is authoritative for every
+document the caller marks completed. The thread keeps the shards of the `max_open`
+most recently used dates open, flushing and closing the oldest beyond that. When a
+shard is opened again, a torn last index line and any shard bytes past the last
+indexed member (left by an interrupted write) are truncated away first. If a
+document is stored twice, the last index entry wins.
+
+Compared with one `YYYYMMDD/N.xml` file per document this keeps two files per
+date instead of hundreds and stores the XML gzip-compressed.
+
+Reader API:
+    find_xml_sources(root)  -> sorted plain *.xml files followed by ShardRefs
+    read_source(source)     -> raw XML bytes for a Path or ShardRef
+    read_source_text(source)-> decoded text, same semantics as open(path, 'r', errors='ignore')
+    read_ref_prefix(ref, n) -> first n bytes of a sharded document, decompressing no more
+    iter_documents(root)    -> (name, xml bytes) for every stored document, shard by shard
+"""
+
+import gzip
+import io
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+
+SHARD_SUFFIX = ".xml.gz"
+INDEX_SUFFIX = ".idx"
+
+
+class ShardRef(NamedTuple):
+    """Location of one document inside a shard."""
+    shard: str
+    offset: int
+    length: int
+    doc_index: int
+    doc_id: str
+
+    @property
+    def name(self) -> str:
+        """Virtual path mirroring the plain-file layout, e.g. 20240103/17.xml."""
+        date = Path(self.shard).name[:-len(SHARD_SUFFIX)]
+        return f"{date}/{self.doc_index}.xml"
+
+
+XMLSource = Union[Path, ShardRef]
+
+
+class _Shard:
+    """Open handles, pending members and callbacks for one date's shard and index."""
+
+    def __init__(self, shard_path: Path, index_path: Path):
+        recover(shard_path, index_path)
+        self.shard_path = shard_path
+        self.data_file = open(shard_path, "ab")
+        self.index_file = open(index_path, "ab")
+        self.durable = self.data_file.tell()
+        self.index_durable = self.index_file.tell()
+        # Shard offset of the next member, counting the pending ones
+        self.end = self.durable
+        self.members: List[bytes] = []
+        self.index_lines: List[bytes] = []
+        self.callbacks: List[Tuple[Optional[Callable[[], None]], Optional[Callable[[Exception], None]]]] = []
+
+    def close(self):
+        self.data_file.close()
+        self.index_file.close()
+
+
+class XMLShardWriter:
+    """Group-committing appender of XML documents to per-date compressed shards."""
+
+    def __init__(self, root: Union[str, Path], compresslevel: int = 6, flush_bytes: int = 4 << 20,
+                 flush_interval: float = 1.0, max_queue: int = 1000, max_open: int = 4,
+                 on_flush: Optional[Callable[[float], None]] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compresslevel = compresslevel
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_open = max_open
+        self.on_flush = on_flush
+        self.logger = logging.getLogger(__name__)
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Open shards, least recently used first
+        self._shards: OrderedDict[str, _Shard] = OrderedDict()
+        self._pending_bytes = 0
+        self._thread = threading.Thread(target=self._run, name="epo-xml-shard-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, date: str, doc_index: int, doc_id: str, content: bytes,
+               on_durable: Optional[Callable[[], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None):
+        """Compress one document and queue it for the shard of its date; blocks while the queue is full."""
+        # Compress in the calling worker: zlib releases the GIL, so workers compress in parallel
+        member = gzip.compress(content, compresslevel=self.compresslevel, mtime=0)
+        self._queue.put(("member", date, (doc_index, doc_id, member, on_durable, on_error)))
+
+    def close(self):
+        """Flush everything queued so far, run its callbacks and close all shards."""
+        self._queue.put(("stop", None, None))
+        self._thread.join()
+
+    def _run(self):
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, date, payload = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    kind, date, payload = "tick", None, None
+
+                if kind == "member":
+                    doc_index, doc_id, member, on_durable, on_error = payload
+                    try:
+                        shard = self._open(date)
+                    except OSError as e:
+                        self.logger.error(f"Cannot open XML shard for {date}: {e}")
+                        if on_error:
+                            on_error(e)
+                        continue
+                    shard.index_lines.append(f"{doc_index}\t{shard.end}\t{len(member)}\t{doc_id}\n".encode("utf-8"))
+                    shard.members.append(member)
+                    shard.callbacks.append((on_durable, on_error))
+                    shard.end += len(member)
+                    self._pending_bytes += len(member)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if self._pending_bytes < self.flush_bytes:
+                        continue
+
+                self._flush()
+                deadline = None
+
+                if kind == "stop":
+                    return
+        finally:
+            for shard in self._shards.values():
+                shard.close()
+            self._shards = OrderedDict()
+
+    def _open(self, date: str) -> _Shard:
+        shard = self._shards.get(date)
+        if shard is not None:
+            self._shards.move_to_end(date)
+            return shard
+        while len(self._shards) >= self.max_open:
+            self._evict()
+        shard = _Shard(self.root / f"{date}{SHARD_SUFFIX}", self.root / f"{date}{INDEX_SUFFIX}")
+        self._shards[date] = shard
+        return shard
+
+    def _evict(self):
+        """Flush and close the least recently used shard."""
+        _, shard = self._shards.popitem(last=False)
+        self._pending_bytes -= shard.end - shard.durable
+        self._flush_shard(shard)
+        try:
+            shard.close()
+        except OSError as e:
+            self.logger.error(f"Failed to close {shard.shard_path}: {e}")
+
+    def _flush(self):
+        """Write and fsync every dirty shard and its index, then acknowledge its documents."""
+        start = time.perf_counter()
+        for shard in self._shards.values():
+            self._flush_shard(shard)
+        self._pending_bytes = 0
+        if self.on_flush:
+            self.on_flush(time.perf_counter() - start)
+
+    def _flush_shard(self, shard: _Shard):
+        """Append one date's pending members, then their index lines, fsyncing each, and run the callbacks."""
+        if not shard.members:
+            return
+        members, shard.members = shard.members, []
+        index_lines, shard.index_lines = shard.index_lines, []
+        callbacks, shard.callbacks = shard.callbacks, []
+        try:
+            shard.data_file.write(b"".join(members))
+            shard.data_file.flush()
+            os.fsync(shard.data_file.fileno())
+            shard.index_file.write(b"".join(index_lines))
+            shard.index_file.flush()
+            os.fsync(shard.index_file.fileno())
+        except OSError as e:
+            self.logger.error(f"Failed to write {shard.shard_path}: {e}")
+            self._rewind(shard)
+            for _, on_error in callbacks:
+                if on_error:
+                    try:
+                        on_error(e)
+                    except Exception as callback_error:
+                        self.logger.error(f"Error callback failed for {shard.shard_path}: {callback_error}")
+            return
+        shard.durable = shard.end
+        shard.index_durable = shard.index_file.tell()
+        for on_durable, _ in callbacks:
+            if on_durable:
+                try:
+                    on_durable()
+                except Exception as e:
+                    self.logger.error(f"Durable-document callback failed for {shard.shard_path}: {e}")
+
+    def _rewind(self, shard: _Shard):
+        """Drop a partially written flush so the shard and index end at their last durable size again."""
+        shard.end = shard.durable
+        try:
+            for handle, size in ((shard.data_file, shard.durable), (shard.index_file, shard.index_durable)):
+                handle.truncate(size)
+                handle.seek(size)
+        except OSError as e:
+            self.logger.error(f"Failed to roll back {shard.shard_path}: {e}")
+
+
+def recover(shard_path: Path, index_path: Path):
+    """Trim an index to its last complete line and its shard to the end of the last indexed member."""
+    index = index_path.read_bytes() if index_path.exists() else b""
+    complete = index.rfind(b"\n") + 1
+    if complete < len(index):
+        with open(index_path, "r+b") as f:
+            f.truncate(complete)
+
+    shard_end = 0
+    for line in index[:complete].splitlines():
+        fields = line.split(b"\t")
+        if len(fields) == 4:
+            shard_end = max(shard_end, int(fields[1]) + int(fields[2]))
+    if shard_path.exists() and shard_path.stat().st_size > shard_end:
+        with open(shard_path, "r+b") as f:
+            f.truncate(shard_end)
+
+
+def read_index(index_path: Path) -> List[ShardRef]:
+    """Read a shard index, keeping the last entry per doc_index, in doc_index order."""
+    shard = str(index_path.with_name(index_path.name[:-len(INDEX_SUFFIX)] + SHARD_SUFFIX))
+    refs: Dict[int, ShardRef] = {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 4:
+                # Torn trailing line from an interrupted write
+                continue
+            doc_index, offset, length, doc_id = fields
+            refs[int(doc_index)] = ShardRef(shard, int(offset), int(length), int(doc_index), doc_id)
+    return [refs[i] for i in sorted(refs)]
+
+
+def iter_shard_refs(root: Union[str, Path]) -> Iterator[ShardRef]:
+    """Yield every stored document under root, shard by shard in date order."""
+    for index_path in sorted(Path(root).rglob(f"*{INDEX_SUFFIX}")):
+        yield from read_index(index_path)
+
+
+def find_xml_sources(root: Union[str, Path]) -> List[XMLSource]:
+    """List plain *.xml files (sorted) followed by every document stored in shards under root."""
+    root = Path(root)
+    files = sorted(path for path in root.rglob("*.xml") if path.is_file())
+    return files + list(iter_shard_refs(root))
+
+
+def source_name(source: XMLSource) -> str:
+    """Human-readable name for a source: the file path, or shard path#doc_index."""
+    if isinstance(source, ShardRef):
+        return f"{source.shard}#{source.doc_index}"
+    return str(source)
+
+
+def read_ref(ref: ShardRef) -> bytes:
+    """Read and decompress one document from its shard."""
+    with open(ref.shard, "rb") as f:
+        f.seek(ref.offset)
+        return gzip.decompress(f.read(ref.length))
+
+
+def read_ref_prefix(ref: ShardRef, size: int, chunk_size: int = 4096) -> bytes:
+    """First `size` bytes of a sharded document, reading and decompressing only what they need."""
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    parts = []
+    remaining = size
+    with open(ref.shard, "rb") as f:
+        f.seek(ref.offset)
+        unread = ref.length
+        while remaining > 0 and unread > 0:
+            chunk = f.read(min(chunk_size, unread))
+            if not chunk:
+                break
+            unread -= len(chunk)
+            part = decompressor.decompress(chunk, remaining)
+            parts.append(part)
+            remaining -= len(part)
+    return b"".join(parts)
+
+
+def read_source(source: XMLSource) -> bytes:
+    """Read the raw XML bytes of a plain file or a sharded document."""
+    if isinstance(source, ShardRef):
+        return read_ref(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def read_source_text(source: XMLSource) -> str:
+    """Decode a source as UTF-8 (ignoring errors) with universal newlines, like open(path, 'r')."""
+    if isinstance(source, ShardRef):
+        return io.TextIOWrapper(io.BytesIO(read_ref(source)), encoding="utf-8", errors="ignore").read()
+    with open(source, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def iter_documents(root: Union[str, Path]) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, xml bytes) for every sharded document, reading each shard sequentially."""
+    for index_path in sorted(Path(root).rglob(f"*{INDEX_SUFFIX}")):
+        refs = sorted(read_index(index_path), key=lambda ref: ref.offset)
+        if not refs:
+            continue
+        with open(refs[0].shard, "rb") as f:
+            for ref in refs:
+                f.seek(ref.offset)
+                yield ref.name, gzip.decompress(f.read(ref.length))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+ingest_us_descriptions.py
+
+Stream a PatentsView detailed-description file (e.g. g_detail_desc_text_2025.tsv.zip)
+into partitioned Parquet, replacing the `pd.read_csv` / quantile / drop_duplicates
+cells of us-descriptions-corpus.ipynb, which need the whole multi-GB table in memory.
+
+The TSV is read straight out of the zip archive (no unzipped copy on disk) with
+pyarrow's streaming CSV reader, one block of --block-size MB at a time. For each
+batch of rows:
+
+    lengths      description_length (computed from the text when the column is
+                 missing) is appended to a compact 4-byte array for the quantiles
+    exact dups   rows whose description has a blake2b-128 digest seen before are
+                 dropped (first occurrence wins); only the 16-byte digests are kept
+    output       the remaining rows, plus a description_hash column, are appended
+                 to zstd Parquet files of at most --rows-per-file rows under
+                 <output_dir>/year=<YEAR>/
+
+After the stream, the --tail-quantiles cutoffs (default 1% and 95%, as in the
+notebook) are computed over all rows' lengths, and each part file is rewritten
+without the rows outside them, one file at a time. Cutting the tail before or after
+dropping duplicates gives the same rows, since duplicates share their length.
+Counts, quantiles and cutoffs are saved to <output_dir>/year=<YEAR>/_stats.json.
+
+Memory holds one block and one part file, plus what grows with the input: a
+4-byte length per row and a 16-byte digest per unique description, kept in a
+DigestSet (../epo-publication-server/digest_set.py) with a bounded insert buffer.
+A year of PatentsView descriptions (a few hundred thousand rows) needs well under
+100 MB of them. The output directory can be read with pyarrow.dataset or pandas,
+or passed to ../epo-publication-server/near_dedup.py as --input.
+
+Requires pyarrow (the "parquet" extra: `uv sync --extra parquet`).
+
+Example:
+    python ingest_us_descriptions.py --input g_detail_desc_text_2025.tsv.zip --output-dir us_descriptions
+"""
+
+import json
+import re
+import sys
+import time
+import zipfile
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import typer
+from typing_extensions import Annotated
+from tqdm import tqdm
+
+# Share the digest and dedup set with the EP cleaning pipeline
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "epo-publication-server"))
+from cleaned_table import text_hash  # noqa: E402
+from digest_set import DigestSet  # noqa: E402
+
+
+app = typer.Typer(help="Stream PatentsView description TSVs into partitioned Parquet")
+
+TEXT_COLUMN = "description_text"
+LENGTH_COLUMN = "description_length"
+HASH_COLUMN = "description_hash"
+
+
+@contextmanager
+def open_tsv(path: Path):
+    """Binary stream of a .tsv file, or of the single .tsv member of a .zip, decompressed on the fly."""
+    if path.suffix != ".zip":
+        with open(path, "rb") as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as archive:
+        members = [name for name in archive.namelist() if name.endswith(".tsv")]
+        if len(members) != 1:
+            raise ValueError(f"Expected one .tsv file in {path}, found {len(members)}")
+        with archive.open(members[0]) as f:
+            yield f
+
+
+def iter_batches(stream, block_size: int):
+    """Record batches of the TSV, parsed block by block."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    reader = pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        parse_options=pacsv.ParseOptions(delimiter="\t", newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types={"patent_id": pa.string(), TEXT_COLUMN: pa.string(),
+                                                           LENGTH_COLUMN: pa.int64()}),
+    )
+    yield from reader
+
+
+class PartWriter:
+    """Append record batches to Parquet files of at most rows_per_file rows each."""
+
+    def __init__(self, directory: Path, rows_per_file: int):
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.paths: List[Path] = []
+        self._writer = None
+        self._rows = 0
+
+    def write(self, batch):
+        import pyarrow.parquet as pq
+
+        while batch.num_rows:
+            if self._writer is None:
+                path = self.directory / f"part-{len(self.paths):05d}.parquet"
+                self._writer = pq.ParquetWriter(path, batch.schema, compression="zstd")
+                self.paths.append(path)
+                self._rows = 0
+            take = min(batch.num_rows, self.rows_per_file - self._rows)
+            self._writer.write_batch(batch.slice(0, take))
+            self._rows += take
+            batch = batch.slice(take)
+            if self._rows >= self.rows_per_file:
+                self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def dedup_batch(batch, seen: DigestSet, lengths: array):
+    """Record the batch's lengths and return its rows with unseen descriptions, plus a hash column."""
+    import pyarrow as pa
+
+    texts = [text or "" for text in batch.column(TEXT_COLUMN).to_pylist()]
+    if LENGTH_COLUMN in batch.schema.names:
+        lengths.extend(length or 0 for length in batch.column(LENGTH_COLUMN).to_pylist())
+    else:
+        lengths.extend(len(text) for text in texts)
+
+    keep = []
+    digests = []
+    for text in texts:
+        digest = text_hash(text)
+        is_new = seen.add_new(digest)
+        keep.append(is_new)
+        if is_new:
+            digests.append(digest)
+    batch = batch.filter(pa.array(keep, type=pa.bool_()))
+    return pa.RecordBatch.from_arrays(batch.columns + [pa.array(digests, type=pa.binary(16))],
+                                      names=batch.schema.names + [HASH_COLUMN])
+
+
+def cut_tail(paths: List[Path], cutoffs: Tuple[float, float], length_column: Optional[str]) -> int:
+    """Rewrite each part without rows whose length is outside cutoffs; returns the rows kept."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    kept = 0
+    low, high = cutoffs
+    for path in tqdm(paths, desc="Cutting tail"):
+        table = pq.read_table(path)
+        lengths = table.column(length_column) if length_column else pc.utf8_length(table.column(TEXT_COLUMN))
+        table = table.filter(pc.and_(pc.greater_equal(lengths, low), pc.less_equal(lengths, high)))
+        tmp_path = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        tmp_path.replace(path)
+        kept += table.num_rows
+    return kept
+
+
+@app.command()
+def main(
+    input_file: Annotated[str, typer.Option("--input", help="PatentsView .tsv.zip (or .tsv)")] = "g_detail_desc_text_2025.tsv.zip",
+    output_dir: Annotated[str, typer.Option("--output-dir", help="Root of the partitioned Parquet output")] = "us_descriptions",
+    year: Annotated[Optional[int], typer.Option("--year", help="Partition year (default: from the file name)")] = None,
+    block_size: Annotated[int, typer.Option("--block-size", help="CSV block size in MB")] = 64,
+    rows_per_file: Annotated[int, typer.Option("--rows-per-file", help="Rows per Parquet part file")] = 50000,
+    tail_quantiles: Annotated[Tuple[float, float], typer.Option("--tail-quantiles", help="Length quantiles to keep")] = (0.01, 0.95),
+    keep_tail: Annotated[bool, typer.Option("--keep-tail", help="Only report the cutoffs, keep all rows")] = False,
+):
+    """
+    Stream the TSV into Parquet parts, dropping exact duplicates and the length tails.
+    """
+    import pyarrow.parquet  # noqa: F401  (fail before reading anything)
+
+    input_path = Path(input_file)
+    if year is None:
+        match = re.search(r"(?:19|20)\d\d", input_path.name)
+        if not match:
+            typer.echo(f"Cannot tell the year from {input_path.name}; pass --year", err=True)
+            raise typer.Exit(1)
+        year = int(match.group(0))
+    partition = Path(output_dir) / f"year={year}"
+    partition.mkdir(parents=True, exist_ok=True)
+    for stale in partition.glob("part-*.parquet"):
+        stale.unlink()
+
+    start = time.perf_counter()
+    seen = DigestSet()
+    lengths = array("i")
+    has_length_column = False
+    writer = PartWriter(partition, rows_per_file)
+    try:
+        with open_tsv(input_path) as stream, tqdm(desc="Reading", unit="rows") as progress:
+            for batch in iter_batches(stream, block_size << 20):
+                has_length_column = LENGTH_COLUMN in batch.schema.names
+                writer.write(dedup_batch(batch, seen, lengths))
+                progress.update(batch.num_rows)
+    finally:
+        writer.close()
+
+    rows_read = len(lengths)
+    rows_unique = len(seen)
+    all_lengths = np.frombuffer(lengths, dtype=np.int32)
+    quantiles = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+    quantile_values = np.quantile(all_lengths, quantiles).tolist() if rows_read else []
+    cutoffs = tuple(np.quantile(all_lengths, tail_quantiles).tolist()) if rows_read else (0, 0)
+    rows_written = rows_unique
+    if not keep_tail and writer.paths:
+        rows_written = cut_tail(writer.paths, cutoffs, LENGTH_COLUMN if has_length_column else None)
+
+    stats = {
+        "input": input_path.name,
+        "year": year,
+        "rows_read": rows_read,
+        "duplicates": rows_read - rows_unique,
+        "rows_written": rows_written,
+        "length_quantiles": dict(zip(map(str, quantiles), quantile_values)),
+        "tail_quantiles": list(tail_quantiles),
+        "tail_cutoffs": list(cutoffs),
+        "tail_cut": not keep_tail,
+        "parts": [path.name for path in writer.paths],
+    }
+    with open(partition / "_stats.json", "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+
+    typer.echo("=" * 72)
+    typer.echo(f"Rows read: {rows_read:,}, exact duplicates: {rows_read - rows_unique:,}")
+    typer.echo(f"Length cutoffs ({tail_quantiles[0]:g}-{tail_quantiles[1]:g}): {cutoffs[0]:.0f}-{cutoffs[1]:.0f}"
+               + (" (not applied)" if keep_tail else ""))
+    typer.echo(f"Saved {rows_written:,} rows in {len(writer.paths)} files under {partition}")
+    typer.echo(f"Total time: {time.perf_counter() - start:.2f} seconds")
+    typer.echo("=" * 72)
+
+
+if __name__ == "__main__":
+    app()